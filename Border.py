@@ -0,0 +1,117 @@
+#!/usr/bin/env python
+
+"""
+Border.py
+"""
+
+__date__       = "20130101"
+__author__     = "jlettvin"
+__maintainer__ = "jlettvin"
+__email__      = "jlettvin@gmail.com"
+__copyright__  = "Copyright(c) 2013 Jonathan D. Lettvin, All Rights Reserved"
+__license__    = "GPLv3"
+__status__     = "Production"
+__version__    = "0.0.1"
+
+"""
+Border.py
+Implements the edge policy shared by diffract, --ready, and Panel.position.
+Copyright(c) 2013 Jonathan D. Lettvin, All Rights Reserved"
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+import numpy
+
+class Border(object):
+    """
+    Border is what to do with the width pixels along each edge of a plane
+    where a convolution kernel reaches past the captured frame.
+    Policies act on the last two axes by slicing, never by multiplying:
+        none    leave the edge as convolved against zero padding
+        zero    assign zero to the edge rows and columns
+        crop    return the interior, 2*width smaller on each axis
+        reflect pad the plane by reflection before convolving
+        wrap    pad the plane by wrapping around before convolving
+    Slices are computed once when the Border is made.
+    """
+
+    policies = ('none', 'zero', 'crop', 'reflect', 'wrap')
+
+    def __init__(self, policy='zero', width=(0, 0)):
+        assert policy in Border.policies
+        self.policy = policy
+        self.width  = (wx, wy) = (width, width) if numpy.isscalar(width) else (
+                tuple(width))
+        self.inside = (Ellipsis, slice(wx, -wx or None), slice(wy, -wy or None))
+        self.edges  = [
+                (Ellipsis, slice(0, wx), slice(None)),
+                (Ellipsis, slice(-wx or None, None), slice(None)),
+                (Ellipsis, slice(None), slice(0, wy)),
+                (Ellipsis, slice(None), slice(-wy or None, None))]
+        self.padding = [(wx, wx), (wy, wy)]
+
+    def oversize(self, size):
+        """capture size that leaves size after cropping"""
+        return tuple(s + 2 * w for s, w in zip(size, self.width))
+
+    def pad(self, source):
+        """source padded for reflect and wrap; convolve it with 'valid'"""
+        if self.policy not in ('reflect', 'wrap'):
+            return source
+        return numpy.pad(source,
+                [(0, 0)] * (source.ndim - 2) + self.padding, self.policy)
+
+    def __call__(self, target):
+        """apply zero or crop to target; other policies return it as is"""
+        if self.policy == 'crop':
+            return target[self.inside]
+        if self.policy == 'zero' and self.width != (0, 0):
+            for edge in self.edges:
+                target[edge] = 0.0
+        return target
+
+#MMMMMMMMMMMMMMMMMMMMMMMMMMMMMMMMMMMMMMMMMMMMMMMMMMMMMMMMMMMMMMMMMMMMMMMMMMMMMM
+if __name__ == "__main__":
+
+    def test_border():
+        """every policy must agree with the dense mask it replaces"""
+        from scipy.signal import convolve
+        plane  = numpy.random.random((3, 21, 23))
+        kernel = numpy.ones((5, 5)) / 25.0
+        for width in (0, 1, 2, (2, 3)):
+            zero = Border('zero', width)
+            mask = numpy.zeros(plane.shape[-2:])
+            mask[zero.inside[1:]] = 1.0
+            assert (zero(plane.copy()) == plane * mask).all()
+            crop = Border('crop', width)
+            assert crop.oversize(crop(plane).shape[-2:]) == plane.shape[-2:]
+            assert Border('none', width)(plane) is plane
+        for policy in ('reflect', 'wrap'):
+            border = Border(policy, 2)
+            padded = border.pad(plane)
+            result = convolve(padded, kernel[None], mode='valid')
+            assert result.shape == plane.shape
+            expect = numpy.pad(plane[0], 2, policy)
+            assert numpy.allclose(result[0],
+                    convolve(expect, kernel, mode='valid'))
+            print "%-7s pad %s -> valid %s" % (
+                    policy, str(padded.shape), str(result.shape))
+        print "zero/crop/none agree with the dense mask"
+
+    test_border()
+
+###############################################################################
+# Border.py <EOF>
+###############################################################################
@@ -32,39 +32,452 @@ You should have received a copy of the GNU General Public License
 along with this program.  If not, see <http://www.gnu.org/licenses/>.
 """
 
-import wx, numpy, scipy, pyopencl
+import os, sys, glob, time, zlib, Queue, threading, itertools, collections
+import numpy, scipy
 
 from optparse import OptionParser
+from Border   import Border
+
+try:
+    import wx
+except ImportError:
+    wx = None   # Headless: only Main.run with a Source and Sink is usable.
+
+class Frames(object): #CCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCC
+    """
+    Frames converts between wx RGB bytes and (3, H, W) float planes.
+    Buffers are allocated once per shape and reused for every frame;
+    unpack returns a view of its buffer, so copy it to keep a frame.
+    """
+
+    def __init__(self, dtype=numpy.float32, coefficient=1.0/255.0): #~~~~~~
+        self.dtype          = dtype
+        self.coefficient    = coefficient
+        self.buffers        = {}
+
+    def buffer(self, name, shape, dtype): #~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+        """the named buffer, reallocated only when its shape changes"""
+        buf = self.buffers.get(name)
+        if buf is None or buf.shape != shape:
+            buf = self.buffers[name] = numpy.empty(shape, dtype)
+        return buf
+
+    def rgb(self, shape): #~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+        """(H, W, 3) uint8 buffer a bitmap can be copied into directly"""
+        return self.buffer('rgb', tuple(shape), numpy.uint8)
+
+    def unpack(self, rgb): #~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+        """(H, W, 3) uint8 bytes to (3, H, W) planes in [0, 1]"""
+        planes = numpy.rollaxis(rgb, 2)
+        sarray = self.buffer('source', planes.shape, self.dtype)
+        numpy.copyto(sarray, planes)
+        sarray /= 255.0
+        return sarray
+
+    def pack(self, tarray): #~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+        """(3, H, W) planes to (H, W, 3) uint8 scaled so the maximum is 255"""
+        scaled = self.buffer('scaled', tarray.shape, self.dtype)
+        numpy.copyto(scaled, tarray, casting='unsafe')
+        numpy.nan_to_num(scaled, copy=False)
+        scaled /= max(scaled.max(), self.coefficient)
+        scaled *= 255.0
+        numpy.clip(scaled, 0.0, 255.0, out=scaled)
+        w, h = tarray.shape[1:]
+        rgb = self.buffer('target', (w, h, 3), numpy.uint8)
+        numpy.copyto(numpy.rollaxis(rgb, 2), scaled, casting='unsafe')
+        return rgb
+
+class Dropping(Queue.Queue): #CCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCC
+    """bounded queue whose put discards the oldest item rather than block"""
+
+    def __init__(self, maxsize): #~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+        Queue.Queue.__init__(self, maxsize)
+        self.dropped = 0
+
+    def put(self, item, block=False, timeout=None): #~~~~~~~~~~~~~~~~~~~~~~~
+        if block:
+            return Queue.Queue.put(self, item, True, timeout)
+        with self.mutex:
+            if self._qsize() >= self.maxsize:
+                self._get()
+                self.dropped          += 1
+                self.unfinished_tasks -= 1
+            self._put(item)
+            self.unfinished_tasks += 1
+            self.not_empty.notify()
+
+class Failed(object): #CCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCC
+    """an exception a filter raised, carried through the outbox to a reader"""
+
+    def __init__(self, info): #~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+        self.info           = info  # sys.exc_info() in the filter thread
+
+    def reraise(self): #~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+        raise self.info[0], self.info[1], self.info[2]
+
+class Turn(object): #CCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCC
+    """
+    Turn is a context that admits ticket n only after tickets before it
+    have passed, so a filter keeping state sees frames in grab order.
+    A turn that is never entered still passes when its filter returns.
+    """
+
+    def __init__(self, pipeline, ticket): #~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+        self.pipeline       = pipeline
+        self.ticket         = ticket
+        self.passed         = False
+
+    def __enter__(self): #~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+        with self.pipeline.turns:
+            while self.pipeline.serving != self.ticket:
+                self.pipeline.turns.wait()
+        return self
+
+    def __exit__(self, aType, aValue, aTraceback): #~~~~~~~~~~~~~~~~~~~~~~~~~
+        self.done()
+
+    def done(self): #~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+        """let the next ticket in (once)"""
+        if self.passed:
+            return
+        self.passed         = True
+        with self.pipeline.turns:
+            while self.pipeline.serving != self.ticket:
+                self.pipeline.turns.wait()
+            self.pipeline.serving += 1
+            self.pipeline.turns.notify_all()
+
+class Pipeline(object): #CCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCC
+    """
+    Pipeline overlaps grab, filter, and paint stages of successive frames.
+    Grabbed frames go through a bounded inbox to one thread per filter;
+    results come back through a bounded outbox to whoever paints.
+    Each filter is called as filter(frame, turn); the part of it that
+    must see frames in order (fun, which keeps state) runs 'with turn'.
+    A filter that raises leaves its thread running; the exception is
+    raised again by get (or Main.run, once the pipeline has drained)
+    in place of that frame's result.
+    When block is False a full queue drops its oldest frame, so a slow
+    filter costs frames rather than responsiveness.
+    Latencies are exponential moving averages in seconds.
+    """
+
+    stages = ('grab', 'filter', 'paint', 'total')
+
+    def __init__(self, filters, depth=2, block=False): #~~~~~~~~~~~~~~~~~~~
+        self.inbox          = Dropping(depth)
+        self.outbox         = Dropping(depth)
+        self.block          = block
+        self.latency        = dict.fromkeys(Pipeline.stages, 0.0)
+        self.sequence       = itertools.count()
+        self.painted        = -1
+        self.dequeue        = threading.Lock()  # ticket in inbox order
+        self.tickets        = itertools.count()
+        self.turns          = threading.Condition()
+        self.serving        = 0
+        self.workers        = [threading.Thread(target=self.work, args=(f,))
+                for f in filters]
+        for worker in self.workers:
+            worker.daemon   = True
+            worker.start()
+
+    def measure(self, stage, seconds, alpha=0.1): #~~~~~~~~~~~~~~~~~~~~~~~~~
+        self.latency[stage] += alpha * (seconds - self.latency[stage])
+
+    def put(self, frame, t0): #~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+        """queue a frame whose grab started at time t0"""
+        self.measure('grab', time.time() - t0)
+        n = next(self.sequence)
+        self.inbox.put((n, t0, frame), self.block)
+        return n
+
+    def work(self, filter): #~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+        while True:
+            with self.dequeue:
+                item = self.inbox.get()
+                turn = Turn(self, next(self.tickets))
+            if item is None:
+                turn.done()
+                return
+            (n, t0, frame) = item
+            t1 = time.time()
+            try:
+                result = filter(frame, turn)
+            except Exception:
+                result = Failed(sys.exc_info())
+            finally:
+                turn.done()
+            self.measure('filter', time.time() - t1)
+            self.outbox.put((n, t0, result), self.block)
+
+    def get(self, block=False): #~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+        """newest unpainted (sequence, t0, result), or None if there is none"""
+        latest = None
+        try:
+            while True:
+                item = self.outbox.get(block and latest is None)
+                if isinstance(item[2], Failed):
+                    item[2].reraise()
+                if item[0] > self.painted and (
+                        latest is None or item[0] > latest[0]):
+                    latest = item
+                if block:
+                    break
+        except Queue.Empty:
+            pass
+        if latest is not None:
+            self.painted = latest[0]
+        return latest
+
+    def done(self, t0, t1): #~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+        """a frame grabbed at t0 whose paint started at t1 is now shown"""
+        t2 = time.time()
+        self.measure('paint', t2 - t1)
+        self.measure('total', t2 - t0)
+
+    def close(self): #~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+        for worker in self.workers:
+            self.inbox.put(None, True)
+        for worker in self.workers:
+            worker.join()
+
+    def __str__(self): #~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+        return '%s queues %d/%d dropped %d/%d' % (
+                ' '.join('%s %.1fms' % (stage, 1e3 * self.latency[stage])
+                    for stage in Pipeline.stages),
+                self.inbox.qsize(), self.outbox.qsize(),
+                self.inbox.dropped, self.outbox.dropped)
+
+class Governor(object): #CCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCC
+    """
+    Governor paces paints to a target rate instead of a fixed poll delay.
+    Each frame is timed from start to done; the next frame is scheduled
+    for whatever is left of the period, so a slow filter is not made
+    slower by a fixed wait on top.  Periods a frame overran are counted
+    as dropped.  A frame whose key (a digest of the captured pixels and
+    the filter program version) matches the previous one is skipped,
+    once the result of a frame lag or more after the first with that key
+    is painted: an RPN target comes out one frame late.
+    """
+
+    def __init__(self, fps=30.0, window=30, lag=1): #~~~~~~~~~~~~~~~~~~~~~~~
+        self.fps            = float(fps)
+        self.period         = 1.0 / self.fps
+        self.lag            = lag
+        self.times          = collections.deque(maxlen=window)
+        self.key            = None
+        self.first          = None  # sequence of the first frame with key
+        self.shown          = -1    # sequence of the newest painted result
+        self.elapsed        = 0.0
+        self.frames         = 0
+        self.dropped        = 0
+        self.skipped        = 0
+
+    def start(self): #~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+        """time at which this frame's work begins"""
+        return time.time()
+
+    def changed(self, key): #~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+        """False (and the frame counted as skipped) when key has settled"""
+        if key != self.key:
+            self.key, self.first = key, None
+            return True
+        if self.first is None or self.shown < self.first + self.lag:
+            return True
+        self.skipped       += 1
+        return False
+
+    def filtered(self, n): #~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+        """frame sequence n, which changed() let through, is being filtered"""
+        if self.first is None:
+            self.first      = n
+
+    def painted(self, n): #~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+        """the result of frame sequence n is painted"""
+        self.shown          = max(self.shown, n)
+
+    def done(self, t0): #~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+        """a frame that started at t0 is painted"""
+        t1                  = time.time()
+        self.elapsed        = t1 - t0
+        self.frames        += 1
+        self.dropped       += int(self.elapsed / self.period)
+        self.times.append(t1)
+
+    def delay(self): #~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+        """milliseconds to wait before the next frame (at least 1)"""
+        return max(1, int(1e3 * (self.period - self.elapsed)))
+
+    @property
+    def achieved(self): #~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+        """frames per second over the last window of paints"""
+        if len(self.times) < 2:
+            return 0.0
+        return (len(self.times) - 1) / max(
+                self.times[-1] - self.times[0], 1e-6)
+
+    def __str__(self): #~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+        return '%.1f/%.0f fps dropped %d skipped %d' % (
+                self.achieved, self.fps, self.dropped, self.skipped)
+
+class Source(object): #CCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCC
+    """
+    Source iterates over (H, W, 3) uint8 frames without wx or a display.
+    Frames may be views of shared buffers, valid until the next frame.
+    """
+
+class DirectorySource(Source): #CCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCC
+    """frames read in name order from the .png and .npy files in path"""
+
+    def __init__(self, path, size=None, count=None): #~~~~~~~~~~~~~~~~~~~~~~
+        self.names = sorted(
+                glob.glob(os.path.join(path, '*.png')) +
+                glob.glob(os.path.join(path, '*.npy')))[:count]
+        self.shape = None if size is None else (size[1], size[0], 3)
+
+    def __iter__(self): #~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+        for name in self.names:
+            if name.endswith('.npy'):
+                rgb = numpy.load(name, mmap_mode='r')
+            else:
+                import Image
+                rgb = numpy.asarray(Image.open(name).convert('RGB'))
+            if self.shape is not None and rgb.shape != self.shape:
+                raise ValueError('%s is %s, not the expected %s' % (
+                    name, str(rgb.shape), str(self.shape)))
+            yield rgb
+
+class RawSource(Source): #CCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCC
+    """frames memory-mapped from a file of concatenated W*H*3 byte frames"""
+
+    def __init__(self, path, size, count=None): #~~~~~~~~~~~~~~~~~~~~~~~~~~~
+        w, h = size
+        self.frames = numpy.memmap(path, numpy.uint8, 'r').reshape(
+                (-1, h, w, 3))[:count]
+
+    def __iter__(self): #~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+        return iter(self.frames)
+
+class SyntheticSource(Source): #CCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCC
+    """point sources on a dim noisy field drifting one pixel per frame"""
+
+    def __init__(self, path=None, size=(101,101), count=100, seed=0): #~~~~~~
+        w, h = size
+        random      = numpy.random.RandomState(seed)
+        self.field  = random.randint(0, 16, (h, w, 3)).astype(numpy.uint8)
+        stars       = random.randint(0, h*w, max(1, h*w//500))
+        self.field.reshape((-1, 3))[stars] = 255
+        self.count  = 100 if count is None else count
+
+    def __iter__(self): #~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+        for frame in range(self.count):
+            yield numpy.roll(self.field, frame, axis=1)
+
+class Sink(object): #CCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCC
+    """Sink consumes (H, W, 3) uint8 frames; it must copy any it keeps."""
+
+    def __init__(self, path=None): #~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+        self.path  = path
+        self.count = 0
+
+    def __call__(self, rgb): #~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+        self.count += 1
+
+    def close(self): #~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+        pass
+
+class DirectorySink(Sink): #CCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCC
+    """frames written to path as frame.NNNNNN.png (or .npy when npy=True)"""
+
+    def __init__(self, path, npy=False): #~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+        super(DirectorySink, self).__init__(path)
+        self.npy = npy
+        if not os.path.isdir(path):
+            os.makedirs(path)
+
+    def __call__(self, rgb): #~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+        name = os.path.join(self.path, 'frame.%06d' % (self.count))
+        if self.npy:
+            numpy.save(name + '.npy', rgb)
+        else:
+            import Image
+            Image.fromarray(rgb).save(name + '.png')
+        self.count += 1
+
+class RawSink(Sink): #CCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCC
+    """frames appended to path as raw bytes, readable by RawSource"""
+
+    def __init__(self, path): #~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+        super(RawSink, self).__init__(path)
+        self.file = open(path, 'wb')
+
+    def __call__(self, rgb): #~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+        numpy.ascontiguousarray(rgb).tofile(self.file)
+        self.count += 1
+
+    def close(self): #~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+        self.file.close()
+
+# --input and --output take 'kind' or 'kind:path'; dir and raw need a path.
+sources = {'dir':DirectorySource, 'raw':RawSource, 'synthetic':SyntheticSource}
+sinks   = {'dir':DirectorySink,   'raw':RawSink,   'null':Sink}
+paths   = ('dir', 'raw')
+
+def parse(spec, kinds): #ffffffffffffffffffffffffffffffffffffffffffffffffffffff
+    """(kind, path) of a 'kind:path' spec, checked against kinds"""
+    kind, _, path = spec.partition(':')
+    if kind not in kinds:
+        raise ValueError('%r: kind must be one of %s' % (
+            spec, '|'.join(sorted(kinds))))
+    if kind in paths and not path:
+        raise ValueError('%r: %s needs a path (%s:path)' % (spec, kind, kind))
+    return kind, path or None
+
+def source(spec, size, count=None): #ffffffffffffffffffffffffffffffffffffffffff
+    """construct a Source from a 'kind:path' command-line spec"""
+    kind, path = parse(spec, sources)
+    return sources[kind](path, size, count)
+
+def sink(spec): #ffffffffffffffffffffffffffffffffffffffffffffffffffffffffffffff
+    """construct a Sink from a 'kind:path' command-line spec"""
+    kind, path = parse(spec, sinks)
+    return sinks[kind](path)
 
 class Capture(object): #CCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCC
 
     def __init__(self, size, **kw): #~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
         self.kw             = kw
-        self.rect           = wx.RectPS((0,0), size)
         self.DC             = {}
         self.BMP            = {}
         self.DC[ 'source']  = wx.ScreenDC()
+        self.DC[ 'memory']  = wx.MemoryDC()
         self.XY             = self.DC[ 'source'].Size
+        self.X, self.Y      = self.XY
+        self.hXY            = [self.X/2, self.Y/2]
+        self.size           = None
 
     def pre(self, client, **kw): #~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
         size                = kw['size']
-        self.X, self.Y      = self.XY
-        self.hXY            = [self.X/2, self.Y/2]
-        self.BMP['source']  = wx.EmptyBitmap(*self.XY)
-        self.BMP['window']  = self.BMP['source'].GetSubBitmap(self.rect)
-        self.limit          = [(0, b-a) for a,b in zip(size, self.XY)]
-        self.DC[ 'memory']  = wx.MemoryDC(self.BMP['source'])
-        self.DC[ 'memory'].Blit(0, 0, self.X, self.Y, self.DC['source'], 0, 0)
-        self.DC[ 'memory'].SelectObject(wx.NullBitmap) # instant response
+        if size != self.size:
+            self.size       = size
+            self.limit      = [(0, b-a) for a,b in zip(size, self.XY)]
         self.DC[ 'target']  = wx.AutoBufferedPaintDC(client)
 
     def get(self, ur, XY): #~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
-        return self.BMP['source'].GetSubBitmap(wx.RectPS(ur,XY))
+        """blit only the XY rectangle at ur into a bitmap reused per size"""
+        XY                  = tuple(XY)
+        bmp                 = self.BMP.get('window')
+        if bmp is None or tuple(bmp.GetSize()) != XY:
+            bmp = self.BMP['window'] = wx.EmptyBitmap(*XY)
+        self.DC[ 'memory'].SelectObject(bmp)
+        self.DC[ 'memory'].Blit(0, 0, XY[0], XY[1], self.DC['source'], *ur)
+        self.DC[ 'memory'].SelectObject(wx.NullBitmap) # instant response
+        return bmp
 
     def put(self, processed): #~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
         self.DC['target'].DrawBitmap(processed, 0, 0)
 
-class Panel(wx.Panel): #CCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCC
+class Panel(wx.Panel if wx else object): #CCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCC
 
     def __init__(self, parent, size, process, dt, **kw): #~~
         super(Panel, self).__init__(parent, -1)
@@ -76,6 +489,9 @@ class Panel(wx.Panel): #CCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCC
         self.process        = process
         self.dt             = dt
         self.ready          = kw.get('ready', False)
+        self.governor       = kw.get('governor') or Governor(
+                kw.get('fps') or 30.0)
+        self.processed      = None
         self.savename = {
                 'D':'Diffract',
                 'H':'Human',
@@ -98,32 +514,33 @@ class Panel(wx.Panel): #CCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCC
                 "ABCDEFGHIJKLMNOPQRSTUVWXYZ")
 
     def update(self): #~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+        # Paint now, then wait only for what is left of the frame period.
         self.Refresh()
         self.Update()
-        wx.CallLater(self.dt, self.update)
+        wx.CallLater(self.governor.delay(), self.update)
 
     def position(self): #~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
         # Request a larger size capture area if convolving.
-        dx, dy        = self.process(None)
-        sx, sy        = self.size
+        # The filter crops the same margin back off (see Border.py).
+        dx, dy        = self.process(None) if self.ready else (0, 0)
+        border        = Border('crop', (dx, dy))
         (X, Y)        = self.capture.limit
         x, y          = [a-b for a,b in zip(self.mXY,[a/2 for a in self.size])]
-        self.frame.SetTitle('(%d,%d)' % (self.mXY))
+        self.frame.SetTitle('(%d,%d) %s' % (self.mXY + (self.governor,)))
 
-        if self.ready:
-            self.oversize = (sx+2*dx, sy+2*dy)
-            return (min(max(x,X[0]+dx),X[1]-dx), min(max(y,Y[0]+dy),Y[1]-dy))
-        else:
-            self.oversize = (sx, sy)
-            return (min(max(x, X[0]), X[1]), min(max(y, Y[0]), Y[1]))
+        self.oversize = border.oversize(self.size)
+        # upper left of the oversize rectangle, kept on screen
+        return (min(max(x-dx, X[0]), X[1]-2*dx), min(max(y-dy, Y[0]), Y[1]-2*dy))
 
     def on_paint(self, event): #~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+        t0              =  self.governor.start()
         self.kw['size'] = self.size
         self.capture.pre(self, **self.kw)
         position        =  self.position()
         self.captured   = (self.capture.get(position, self.oversize))
         self.processed  =  self.process(self.captured)
         if self.processed: self.capture.put(self.processed)
+        self.governor.done(t0)
 
     def on_timer(self, event): #~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
         self.mXY            = tuple(wx.GetMousePosition())
@@ -142,7 +559,7 @@ class Panel(wx.Panel): #CCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCC
         self.captured .ConvertToImage().SaveFile(srcname, wx.BITMAP_TYPE_PNG)
         self.processed.ConvertToImage().SaveFile(tgtname, wx.BITMAP_TYPE_PNG)
 
-class Frame(wx.Frame): #CCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCC
+class Frame(wx.Frame if wx else object): #CCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCC
 
     def __init__(self, size, transform, dt, **kw):
         self.kw = kw
@@ -157,7 +574,7 @@ class Main(object):
 
     #~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
     def reverseRB(self, source, **kw):
-        if source == None:
+        if source is None:
             return (2,2)
         sw, sx, sy  = ssize = source.shape
         tx, ty      = tsize = self.size
@@ -187,58 +604,87 @@ class Main(object):
         self.size       = kw.get('size'     , (201,201))
         self.dt         = kw.get('dt'       ,        10)
         self.coefficient= 1.0 / 255.0
-        self.ctx        = pyopencl.create_some_context()
-        self.queue      = pyopencl.CommandQueue(self.ctx)
-        self.gpu        = {}
-        self.loadGPUcode('noop')
         self.dtype      = scipy.float32
         self.gpgpu      = kw.get('gpgpu', False)
-        self.oshape     = None
-        self.mf         = pyopencl.mem_flags
-        self.srcFlags   = self.mf. READ_ONLY|self.mf.COPY_HOST_PTR
-        self.tgtFlags   = self.mf.WRITE_ONLY
+        self.verbose    = kw.get('verbose', False)
+        self.frames     = Frames(self.dtype, self.coefficient)
+        self.threads    = kw.get('threads'  ,         1)
+        self.pipeline   = None
+        self.governor   = Governor(kw.get('fps') or 30.0)
+        self.sequence   = itertools.count()  # frames filtered without threads
+        self.lock       = threading.Lock()  # fun keeps state (RPN stack).
+        self.tbmp       = None
+
+    #~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+    def worker(self):
+        """a filter with its own output buffers for one pipeline thread"""
+        frames          = Frames(self.dtype, self.coefficient)
+        return lambda rgb, turn: self.filter(rgb, frames, turn).copy()
 
     #~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
     def __call__(self, **kw):
         self.fun        = kw.get('fun'      ,      self.reverseRB )
+        if self.threads:
+            self.pipeline = Pipeline(
+                    [self.worker() for thread in range(self.threads)])
         app             = wx.PySimpleApp()
-        self.frame      = Frame(self.size, self.process, self.dt, **kw)
+        self.frame      = Frame(self.size, self.process, self.dt,
+                governor=self.governor, **kw)
         self.frame.Center()
         self.frame.Show()
         app.MainLoop()
 
     #~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
-    def loadGPUcode(self, filename):
-        with open(filename+'.cl', 'r') as source:
-            code = "".join(source.readlines())
-            self.gpu[filename] = pyopencl.Program(self.ctx, code).build()
-
-    #~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
-    def jit(self, sarray):
-        # Starting setup for gpgpu
-        self.a          = sarray
-        self.a_src      = pyopencl.Buffer(self.ctx, self.srcFlags, hostbuf=self.a)
-        if not self.oshape or self.shape != self.oshape:
-            self.oshape = self.shape
-            self.b      = scipy.zeros(self.shape, type(sarray))
-            self.b_src  = pyopencl.Buffer(self.ctx, self.srcFlags, hostbuf=self.b)
-            self.b_tgt  = pyopencl.Buffer(self.ctx, self.tgtFlags, self.b.nbytes)
-        # Finished setup for gpgpu
-
-    #~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
-    def withGPU(self, sarray):
-        self.jit(sarray)
-        # Starting exec for gpgpu
-        self.gpu['noop'].code(self.queue, self.a.shape, None, self.a_src, self.b_tgt)
-        tarray          = numpy.empty_like(self.a)
-        pyopencl.enqueue_read_buffer(self.queue, self.b_tgt, tarray).wait()
-        # tarray now contains the result
-        # Finished exec for gpgpu
-        return tarray
+    def run(self, source, sink, **kw):
+        """filter every frame of source into sink without wx or a display"""
+        self.fun        = kw.get('fun'      ,      self.reverseRB )
+        t0, count       = time.time(), 0
+        if not self.threads:
+            for rgb in source:
+                sink(self.filter(rgb))
+                count  += 1
+            sink.close()
+            return count, time.time() - t0
+        # Nothing is dropped offline; results are sunk in source order.
+        pipeline        = Pipeline(
+                [self.worker() for thread in range(self.threads)], block=True)
+        stop            = threading.Event()     # set when a filter fails
+        def produce():
+            for rgb in source:
+                if stop.is_set():
+                    break
+                pipeline.put(numpy.array(rgb), time.time())
+            pipeline.close()
+            pipeline.outbox.put(None, True)
+        producer        = threading.Thread(target=produce)
+        producer.daemon = True
+        producer.start()
+        waiting, failed = {}, None
+        for item in iter(pipeline.outbox.get, None):
+            # After a failure, drain what is in flight so threads can end.
+            if isinstance(item[2], Failed):
+                failed  = failed or item[2]
+                stop.set()
+            if failed:
+                continue
+            waiting[item[0]] = item
+            while count in waiting:
+                (n, t1, rgb) = waiting.pop(count)
+                t2      = time.time()
+                sink(rgb)
+                pipeline.done(t1, t2)
+                count  += 1
+        producer.join()
+        sink.close()
+        if failed:
+            failed.reraise()
+        if self.verbose:
+            print pipeline
+        return count, time.time() - t0
 
     #~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
     def withCPU(self, sarray):
-        tarray      = scipy.array(self.fun(sarray, **self.kw), self.dtype)
+        tarray      = numpy.asarray(self.fun(sarray, **self.kw), self.dtype)
         #if tarray == None:
             #self.frame.Close(True)
             #return pwh, None
@@ -249,43 +695,135 @@ class Main(object):
     # This is the core function that calls the RPN client.
     def process(self, sbmp):
         """Core function"""
-        if sbmp == None:
-            # Oversize required
-            return self.size
+        if sbmp is None:
+            # Oversize required: the margin fun crops from --ready frames
+            return self.fun(None, **self.kw)
         # reverse height and width under advice
         (ws, hs, ps)    = shape = (sbmp.GetHeight(), sbmp.GetWidth(), 3)
-        simg            = wx.ImageFromBitmap(sbmp)
-
-        sarray          = scipy.array(scipy.fromstring(simg.GetData(), 'uint8'), self.dtype) / 255.0
-        sarray          = scipy.rollaxis(scipy.reshape(sarray, shape), 2)
-        self.shape      = sarray.shape
-
-        tarray          = (self.withGPU if self.gpgpu else self.withCPU)(sarray)
-        mm              = (sarray.min(), sarray.max(), tarray.min(), tarray.max())
-        #print '\t', sarray.shape, tarray.shape,
-        print type(sarray[0,0,0]), type(tarray[0,0,0]), mm
+        t0              = time.time()
+        if self.pipeline is None:
+            rgb         = self.frames.rgb(shape)
+        else:
+            rgb         = numpy.empty(shape, numpy.uint8)
+        sbmp              .CopyToBuffer(rgb)
+        # Same pixels through the same program: repaint the last result.
+        key             = (shape, zlib.crc32(rgb), self.version())
+        changed         = self.governor.changed(key)
+        if self.pipeline is None:
+            if changed:
+                n       = next(self.sequence)
+                self.governor.filtered(n)
+                self.tbmp = wx.BitmapFromBuffer(ws, hs, self.filter(rgb))
+                self.governor.painted(n)
+        else:
+            # grab now, paint the newest frame any filter thread finished,
+            # even when skipping, so results still in flight are shown.
+            if changed:
+                self.governor.filtered(self.pipeline.put(rgb, t0))
+            latest      = self.pipeline.get()
+            if latest is not None:
+                (n, t0, rgb)= latest
+                t1          = time.time()
+                (ws, hs, ps)= rgb.shape
+                self.tbmp   = wx.BitmapFromBuffer(ws, hs, rgb)
+                self.pipeline.done(t0, t1)
+                self.governor.painted(n)
+        if self.pipeline is not None:
+            self.frame.SetTitle('%s %s' % (self.frame.GetTitle(), self.pipeline))
+        return self.tbmp
 
-        tarray          = numpy.nan_to_num(tarray)
-        tarray         /= max(tarray.max(), self.coefficient)
-        tarray          = scipy.array((tarray * 255.0).tolist(), 'uint8')
+    #~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+    def version(self):
+        """what fun reports about its program (RPN: codefile stat)"""
+        version         = getattr(self.fun, 'version', None)
+        return version(**self.kw) if version else None
 
-        tarray          = scipy.dstack(tarray)
-        timg            = wx.EmptyImage(ws, hs)
-        timg              .SetData(tarray.tostring())
-        self.tbmp       = timg.ConvertToBitmap()
-        return self.tbmp
+    #~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+    def filter(self, rgb, frames=None, turn=None):
+        """(H, W, 3) uint8 frame in, filtered (H, W, 3) uint8 frame out"""
+        frames          = frames or self.frames
+
+        # With --gpgpu, fun runs its plane operations on a Device.
+        # fun keeps state, so pipeline threads take their turn in order.
+        # It may keep views of the source (RPN Rs/Gs/Bs/Ss) and return
+        # them a frame later, so every thread unpacks into the one shared
+        # source buffer, and packs, during its turn, exactly as serial.
+        with turn or self.lock:
+            sarray      = self.frames.unpack(rgb)
+            self.shape  = sarray.shape
+            tarray      = self.withCPU(sarray)
+            if self.verbose:
+                mm      = (sarray.min(), sarray.max(), tarray.min(), tarray.max())
+                print type(sarray[0,0,0]), type(tarray[0,0,0]), mm
+            return frames.pack(tarray)
 
 if __name__ == '__main__': #MMMMMMMMMMMMMMMMMMMMMMMMMMMMMMMMMMMMMMMMMMMMMMMMMMM
 
+    def benchmark(radii=(50, 100, 200), frames=50):
+        """frames per second converting bytes to planes and back"""
+        import time
+        def legacy(data, shape):
+            sarray = scipy.array(scipy.fromstring(data, 'uint8'), 'float32') / 255.0
+            sarray = scipy.rollaxis(scipy.reshape(sarray, shape), 2)
+            tarray = numpy.nan_to_num(scipy.array(sarray, 'float32'))
+            tarray/= max(tarray.max(), 1.0 / 255.0)
+            tarray = scipy.array((tarray * 255.0).tolist(), 'uint8')
+            return scipy.dstack(tarray).tostring()
+        def current(data, shape):
+            rgb = converter.rgb(shape)
+            rgb.flat = numpy.frombuffer(data, numpy.uint8)
+            tarray = numpy.asarray(converter.unpack(rgb), 'float32')
+            return converter.pack(tarray)
+        converter = Frames()
+        for radius in radii:
+            edge  = 2 * radius + 1
+            shape = (edge, edge, 3)
+            data  = numpy.random.randint(0, 256, shape).astype('uint8').tostring()
+            assert legacy(data, shape) == current(data, shape).tostring()
+            for name, convert in (('legacy', legacy), ('current', current)):
+                t0 = time.time()
+                for frame in range(frames):
+                    convert(data, shape)
+                print 'radius %3d %-7s %8.1f frames/second' % (
+                        radius, name, frames / (time.time() - t0))
+
     parser = OptionParser()
     parser.add_option(
             '-e', '--ready', action="store_true", default=False, help="ready")
     parser.add_option(
             '-g', '--gpgpu', action="store_true", default=False, help="use gpgpu")
+    parser.add_option(
+            '-b', '--benchmark', action="store_true", default=False,
+            help="report frame conversion rate at window radii 50, 100, 200")
+    parser.add_option(
+            '-i', '--input', type=str, default=None,
+            help="filter headless frames from %s[:path]" % ('|'.join(sources)))
+    parser.add_option(
+            '-o', '--output', type=str, default='null',
+            help="send headless frames to %s[:path]" % ('|'.join(sinks)))
+    parser.add_option(
+            '-n', '--frames', type=int, default=None,
+            help="number of headless frames")
+    parser.add_option(
+            '-f', '--fps', type=float, default=30.0,
+            help="target frames per second for the screen viewer")
+    parser.add_option(
+            '-t', '--threads', type=int, default=1,
+            help="filter threads between grab and paint (0: no pipeline)")
     parser.add_option(
             '-v', '--verbose', action="store_true", default=False, help="test")
     (opts, args) = parser.parse_args()
     kw = vars(opts)
 
-    main = Main(**kw)
-    main(**kw)
+    if kw.pop('benchmark'):
+        benchmark()
+    elif kw['input']:
+        main = Main(**kw)
+        count, seconds = main.run(
+                source(kw['input'], main.size, kw['frames']),
+                sink(kw['output']))
+        print '%d frames in %.3f seconds (%.1f frames/second)' % (
+                count, seconds, count / seconds)
+    else:
+        main = Main(**kw)
+        main(**kw)
@@ -0,0 +1,258 @@
+#!/usr/bin/env python
+
+"""
+Device.py
+"""
+
+__date__       = "20130101"
+__author__     = "jlettvin"
+__maintainer__ = "jlettvin"
+__email__      = "jlettvin@gmail.com"
+__copyright__  = "Copyright(c) 2013 Jonathan D. Lettvin, All Rights Reserved"
+__license__    = "GPLv3"
+__status__     = "Production"
+__version__    = "0.0.1"
+
+"""
+Device.py
+Implements the --gpgpu plane operations in OpenCL with a CPU fallback.
+Copyright(c) 2013 Jonathan D. Lettvin, All Rights Reserved"
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+###############################################################################
+import numpy, scipy
+
+from scipy.signal                import convolve
+from scipy.ndimage.interpolation import affine_transform
+
+###############################################################################
+class Device(object):
+    """
+    Device runs convolve, scale, normalize, and zoom on one float32 plane.
+    Device buffers for source, weights, mask, and target persist across
+    frames and are only reallocated when a plane changes size;
+    weights and mask are only uploaded when a different array is passed.
+    Without pyopencl or an OpenCL device the same operations run on CPU.
+    A (P, X, Y) stack is processed one plane at a time in the same buffers.
+    """
+
+    #~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+    def __init__(self, programs=('noop', 'diffract'), **kw):
+        self.kw         = kw
+        self.verbose    = kw.get('verbose', False)
+        self.buffers    = {}    # name: device buffer
+        self.uploaded   = {}    # name: host array last copied to the device
+        self.gpu        = {}
+        self.ctx        = None
+        self.unmasked   = None  # all ones, so no mask is uploaded only once
+        try:
+            import pyopencl
+            self.pyopencl = pyopencl
+            self.ctx      = pyopencl.create_some_context(interactive=False)
+            self.queue    = pyopencl.CommandQueue(self.ctx)
+            for filename in programs:
+                self.loadGPUcode(filename)
+        except Exception, e:
+            self.ctx      = None
+            if self.verbose:
+                print 'Device: no OpenCL (%s); using CPU' % (e)
+        if self.verbose and self.ctx:
+            print 'Device:', ', '.join(d.name for d in self.ctx.devices)
+
+    #~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+    @property
+    def available(self):
+        return self.ctx is not None
+
+    #~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+    def loadGPUcode(self, filename):
+        with open(filename+'.cl', 'r') as source:
+            code = "".join(source.readlines())
+            self.gpu[filename] = self.pyopencl.Program(self.ctx, code).build()
+
+    #~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+    def buffer(self, name, nbytes):
+        """the named device buffer, reallocated only when its size changes"""
+        buf = self.buffers.get(name)
+        if buf is None or buf.size != nbytes:
+            buf = self.buffers[name] = self.pyopencl.Buffer(
+                    self.ctx, self.pyopencl.mem_flags.READ_WRITE, nbytes)
+            self.uploaded.pop(name, None)
+        return buf
+
+    #~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+    def upload(self, name, array, persistent=False):
+        """copy array into the named buffer unless it is already there"""
+        if persistent and self.uploaded.get(name) is array:
+            return self.buffers[name]
+        host = numpy.ascontiguousarray(array, numpy.float32)
+        buf  = self.buffer(name, host.nbytes)
+        self.pyopencl.enqueue_copy(self.queue, buf, host)
+        if persistent:
+            self.uploaded[name] = array
+        return buf
+
+    #~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+    def download(self, shape, target=None):
+        """the target buffer as a new host array (or into target)"""
+        if target is None:
+            target = numpy.empty(shape, numpy.float32)
+        self.pyopencl.enqueue_copy(self.queue, target, self.buffers['target'])
+        return target
+
+    #~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+    def planes(self, operation, source, *args):
+        """apply a plane operation to each plane of a stack"""
+        target = numpy.empty(source.shape, numpy.float32)
+        for n, plane in enumerate(source):
+            target[n] = operation(plane, *[arg[n] for arg in args])
+        return target
+
+    #~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+    def noop(self, source):
+        """round trip a plane through the device unchanged"""
+        if not self.available:
+            return numpy.array(source, numpy.float32)
+        src = self.upload('source', source)
+        tgt = self.buffer('target', src.size)
+        self.gpu['noop'].code(self.queue, (source.size,), None, src, tgt)
+        return self.download(source.shape)
+
+    #~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+    def convolve(self, source, weights, factor=1.0, mask=None):
+        """'same' convolution of a plane, then scaled by factor and mask"""
+        if not self.available:
+            weights = weights[(None,) * (source.ndim - 2)]
+            target = convolve(source, weights, mode='same', method='direct')
+            target *= factor
+            if mask is not None:
+                target *= mask
+            return target
+        if source.ndim == 3:
+            return self.planes(lambda plane:
+                    self.convolve(plane, weights, factor, mask), source)
+        if mask is None:
+            if self.unmasked is None or self.unmasked.shape != source.shape:
+                self.unmasked = numpy.ones(source.shape, numpy.float32)
+            mask = self.unmasked
+        src = self.upload('source' , source)
+        wts = self.upload('weights', weights, persistent=True)
+        msk = self.upload('mask'   , mask   , persistent=True)
+        tgt = self.buffer('target' , src.size)
+        KX, KY = weights.shape
+        self.gpu['diffract'].convolve(self.queue, source.shape, None,
+                src, wts, msk, tgt,
+                numpy.int32(KX), numpy.int32(KY), numpy.float32(factor))
+        return self.download(source.shape)
+
+    #~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+    def scale(self, source, factor):
+        """a plane multiplied by factor"""
+        if not self.available:
+            return source * factor
+        src = self.upload('source', source)
+        tgt = self.buffer('target', src.size)
+        self.gpu['diffract'].scale(self.queue, source.shape, None,
+                src, tgt, numpy.float32(factor))
+        return self.download(source.shape)
+
+    #~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+    def normalize(self, source):
+        """a plane scaled so that its maximum is 1.0 (unless it is 0.0)"""
+        if source.ndim == 3:
+            return self.planes(self.normalize, source)
+        M = source.max()
+        M = 1.0 if M == 0.0 else M
+        if not self.available:
+            return source / M
+        return self.scale(source, 1.0 / M)
+
+    #~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+    def zoom(self, source, coeff, order=3):
+        """a plane magnified by 1/coeff about its center (as RPN.zoom)"""
+        if source.ndim == 3:
+            coeffs = numpy.broadcast_to(
+                    numpy.asarray(coeff, float).reshape(-1), source.shape[:1])
+            return self.planes(
+                    lambda plane, c: self.zoom(plane, c, order),
+                    source, coeffs)
+        X, Y   = source.shape
+        offset = [X*(1.0-coeff)/2.0, Y*(1.0-coeff)/2.0]
+        # The device kernel only interpolates cubic splines.
+        if not self.available or order != 3:
+            kernel = [[coeff, 0.0], [0.0, coeff]]
+            return affine_transform(source, kernel, offset=offset,
+                    order=order, prefilter=False)
+        src = self.upload('source', source)
+        tgt = self.buffer('target', src.size)
+        self.gpu['diffract'].zoom(self.queue, source.shape, None,
+                src, tgt, numpy.float32(coeff),
+                numpy.float32(offset[0]), numpy.float32(offset[1]))
+        return self.download(source.shape)
+
+#MMMMMMMMMMMMMMMMMMMMMMMMMMMMMMMMMMMMMMMMMMMMMMMMMMMMMMMMMMMMMMMMMMMMMMMMMMMMMM
+if __name__ == "__main__":
+
+    def test_device(device, tolerance=1e-5):
+        """OpenCL results must match the CPU fallback within tolerance"""
+        cpu    = Device(programs=())
+        cpu.ctx = None
+        source = scipy.random.random((101, 101)).astype(numpy.float32)
+        mask   = (scipy.random.random((101, 101)) > 0.1).astype(numpy.float32)
+        for R in (3, 10):
+            weights = scipy.load(
+                    "kernels/Airy/kernel.Airy.R%d.dx0.00.dy0.00.npy" % (R))
+            weights = weights / weights.sum()
+            for frame in range(2):  # The second frame reuses the weights.
+                error = numpy.fabs(device.convolve(source, weights, 0.95, mask)
+                        - cpu.convolve(source, weights, 0.95, mask)).max()
+                assert error < tolerance
+            print "convolve R%-2d |gpu-cpu| = %.1e" % (R, error)
+        for name, args in (
+                ('noop', ()), ('scale', (0.5,)), ('normalize', ()),
+                ('zoom', (0.9,)), ('zoom', (1.1,)), ('zoom', (0.9, 1))):
+            error = numpy.fabs(getattr(device, name)(source, *args) -
+                    getattr(cpu, name)(source, *args)).max()
+            assert error < tolerance
+            print "%-9s %-6s |gpu-cpu| = %.1e" % (name, args, error)
+
+    def test_planes(device, tolerance=1e-5):
+        """a (3, X, Y) stack must match its planes one at a time"""
+        source  = scipy.random.random((3, 61, 61)).astype(numpy.float32)
+        weights = scipy.load("kernels/Airy/kernel.Airy.R5.dx0.00.dy0.00.npy")
+        coeffs  = numpy.array([0.9, 1.0, 1.1]).reshape((3, 1, 1))
+        for name, args, each in (
+                ('convolve' , (weights, 0.95), lambda n: (weights, 0.95)),
+                ('normalize', ()             , lambda n: ()),
+                ('zoom'     , (coeffs,)      , lambda n: (coeffs[n, 0, 0],)),
+                ('zoom'     , (coeffs, 1)    , lambda n: (coeffs[n, 0, 0], 1))):
+            batch = getattr(device, name)(source, *args)
+            error = max(numpy.fabs(batch[n] -
+                getattr(device, name)(source[n], *each(n))).max()
+                for n in range(3))
+            assert error < tolerance
+            print "%-9s (3,X,Y) |stack-planes| = %.1e" % (name, error)
+
+    device = Device(verbose=True)
+    test_planes(device)
+    if device.available:
+        test_device(device)
+    else:
+        print 'no OpenCL device; nothing to compare against the CPU path'
+
+###############################################################################
+# Device.py <EOF>
+###############################################################################
@@ -33,14 +33,21 @@ along with this program.  If not, see <http://www.gnu.org/licenses/>.
 """
 
 ###############################################################################
-import sys, itertools, scipy
+import os, sys, itertools, tempfile, scipy
 
 from scipy                       import array, arange, ones, zeros
-from scipy                       import exp, sqrt, pi, fabs, ceil
+from scipy                       import exp, sqrt, pi, fabs, ceil, dot
 from scipy                       import set_printoptions
 from scipy.special               import j1
+from scipy.signal                import convolve, bspline
+from scipy.sparse                import csr_matrix, block_diag
+from scipy.fftpack               import next_fast_len
+from scipy.linalg                import svd
+from numpy.fft                   import rfftn, irfftn
 from scipy.misc                  import imresize
 from scipy.ndimage.interpolation import affine_transform
+from scipy.ndimage.filters       import convolve1d
+from numpy                       import pad
 from Image                       import fromarray
 
 from Pickets                     import Pickets
@@ -48,6 +55,61 @@ from Report                      import Report
 ###############################################################################
 set_printoptions(precision=2, suppress=True, linewidth=150)
 
+###############################################################################
+class Kernels(object):
+    """
+    Kernels is a persistent on-disk store of generated Airy kernels.
+    A kernel is named by every parameter it depends on, so a stored file
+    is only reused for identical wavelength, aperture, focal length,
+    sub-pixel offset, and picket count.
+    Stored kernels are memory-mapped read-only; misses are generated,
+    then written atomically so concurrent sessions never see partial files.
+    Kernels are returned read-only on a miss too; copy one to modify it.
+    """
+
+    #~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+    def __init__(self, directory='kernels/Airy', png=False):
+        self.directory  = directory
+        self.png        = png       # Also write a .png preview on a miss.
+        self.stats      = {'hits': 0, 'misses': 0}
+
+    #~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+    def name(self, wavelength, aperture, focal, dx, dy, pickets):
+        """path, without extension, of the kernel for these parameters"""
+        return os.path.join(self.directory,
+                "kernel.Airy.w%.6e.a%.6e.f%.6e.dx%.4f.dy%.4f.P%d" % (
+                    wavelength, aperture, focal, dx, dy, pickets))
+
+    #~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+    def write(self, kernel, name):
+        """write name.npy by rename so readers see all or nothing"""
+        if not os.path.isdir(self.directory):
+            os.makedirs(self.directory)
+        handle, temp = tempfile.mkstemp(suffix='.npy', dir=self.directory)
+        with os.fdopen(handle, 'wb') as target:
+            scipy.save(target, kernel)
+        os.chmod(temp, 0644)
+        try:
+            os.rename(temp, name+".npy")
+        except OSError:
+            # Another writer got there first (rename over a file on Windows).
+            os.remove(temp)
+        if self.png:
+            fromarray((255.0 * kernel).astype('uint8')).save(name+".png")
+
+    #~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+    def __call__(self, generate, **key):
+        """load the kernel for key, calling generate() only on a miss"""
+        name = self.name(**key)
+        if os.path.exists(name+".npy"):
+            self.stats['hits'] += 1
+            return scipy.load(name+".npy", mmap_mode='r')
+        self.stats['misses'] += 1
+        kernel = generate()
+        self.write(kernel, name)
+        kernel.flags.writeable = False
+        return kernel
+
 ###############################################################################
 class Human(Report):
 
@@ -103,6 +165,9 @@ class Human(Report):
 
         self.offset     = Pickets(4)
         self.pickets    = Pickets(1)
+        self.store      = Kernels(
+                self.kw.get('kernels', 'kernels/Airy'),
+                png=self.kw.get('png', False))
 
         kw['radius']    = 0.0
         test = self.wave()
@@ -144,7 +209,7 @@ class Human(Report):
 
     #~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
     def genRadii(self, R, dxy=(0.0,0.0), exy=(0.0,0.0)):
-        edge     = 1.0 + 2.0 * R
+        edge     = int(1.0 + 2.0 * R)
         um       = 1e-6
         accum    = zeros((edge, edge), float)
         radii    = zeros((edge, edge), float)
@@ -158,41 +223,60 @@ class Human(Report):
 
     #~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
     def genAiry(self, dx, dy, w, a, **kw):
-        if self.verbose:
-            self.info("generating kernel at offset(%1.1f,%1.1f)" % (dx,dy))
-        um                 = 1e-6                     # microns     in meters
+        """return the read-only kernel from the store, made only if absent"""
+        self.sizeAiry(w, a, kw)
+        return self.store(lambda: self.airy(dx, dy, **kw),
+                wavelength=w, aperture=a,
+                focal=kw.get('focal', Human.aawf['focal']),
+                dx=dx, dy=dy, pickets=len(self.pickets.data))
+
+    #~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+    def sizeAiry(self, w, a, kw):
+        """set radius and edge of the kernel for wavelength and aperture"""
         kw['aperture'  ]   = a                        # millimeters in meters
         kw['wavelength']   = w                        # nanometers  in meters
         R = self.radius    = self.kernelRadius(**kw)  # max displace from (0,0)
+        self.edge          = 3 + 2 * R                # 1 + 2 * (R+1) for slop
+
+    #~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+    def makeAiry(self, dx, dy, w, a, **kw):
+        """generate the kernel without consulting the store"""
+        self.sizeAiry(w, a, kw)
+        return self.airy(dx, dy, **kw)
+
+    #~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+    def airy(self, dx, dy, **kw):
+        """generate the kernel sized by the last sizeAiry"""
+        if self.verbose:
+            self.info("generating kernel at offset(%1.1f,%1.1f)" % (dx,dy))
+        um                 = 1e-6                     # microns     in meters
+        R                  = self.radius              # max displace from (0,0)
         R1                 = R + 1                    # slop for subpixel offset
-        self.edge          = 1 + 2 * R1               # linear size of mask
-        radii              = zeros((self.edge, self.edge), float)
         accum              = zeros((self.edge, self.edge), float)
-        # Make a list of [X,Y] indices and (x,y) coordinates from (0,0) center.
-        sequence           = [(X, Y, um*float(X-R1), um*float(Y-R1)) for X, Y in
-                list(itertools.product(range(self.edge), repeat=2))]
+        # (x,y) coordinates from (0,0) center as a column and a row.
+        x                  = um * (arange(self.edge, dtype=float) - R1)
+        x, y               = x[:, None], x[None, :]
         # List of sub-pixel displacements
-        pickets1           = [[0.0,0.0],]
         pickets2           = array(self.pickets.data) * um
+        ex                 = pickets2[:, 0, None, None]
         # Introduce multiple small offsets to emulate a pixel's
         # physical face size.  This eliminates sampling errors
         # that would artificially amplify exactly centered pixels.
-        for ex, ey in pickets2:
-            for X, Y, x, y in sequence:
-                # Determine optical displacement
-                radii[X,Y] = sqrt((x+dx+ex)**2 + (y+dy+dy)**2)
-            kw['radius']   = radii
-            # Generate wave function
-            component      = self.wave(**kw)
-            # Eliminate radii outside third zero?
-            component[radii > (R*um)] = 0.0
-            # Sum (precursor to discrete integration.
+        # Determine optical displacement for all pickets at once.
+        # The y term repeats dy rather than using ey, as the kernels
+        # stored in kernels/Airy were generated that way.
+        radii              = sqrt((x+dx+ex)**2 + (y+dy+dy)**2)
+        kw['radius']       = radii
+        # Generate wave function
+        components         = self.wave(**kw)
+        # Eliminate radii outside third zero?
+        components[radii > (R*um)] = 0.0
+        # Sum (precursor to discrete integration) in picket order.
+        for component in components:
             accum         += component
         # Normalize to sqrt of intensity map sum
         accum             /= sqrt((accum ** 2).sum())
-        # Keep a copy as a file.
-        self.save(accum, R, dx, dy)
-        # Return kernel.
+        # Return kernel (genAiry keeps a copy as a file).
         return accum
 
     #~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
@@ -211,13 +295,186 @@ class Human(Report):
         accum *= fudge / accum.sum()                # normalize mask
         return accum
 
+###############################################################################
+class Convolver(object):
+    """
+    Convolver convolves color planes with one kernel, directly or by FFT.
+    The kernel spectrum is computed once per padded frame shape
+    and reused for every plane and every frame of that shape.
+    A (P, X, Y) stack of planes is convolved plane by plane in one call.
+    """
+
+    # Cost of one FFT butterfly in units of one direct multiply-add.
+    # Conservative: on 101x101 and 201x201 frames FFT was already
+    # 10-25 times faster for the smallest stored (R3, 9x9) Airy kernel.
+    ratio   = 2.0
+    methods = ['auto', 'direct', 'fft', 'separable']
+
+    #~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+    def __init__(self, kernel, budget=1.0/255.0):
+        self.kernel  = kernel
+        self.budget  = budget   # Largest invisible error (see Human.ignore).
+        self.spectra = {}
+        self.factors = {}       # budget: (rank, error, columns, rows)
+
     #~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
-    def save(self, kernel, R, dx=0, dy=0, **kw):
-        rescaled = (255.0 * kernel).astype('uint8')
-        name = "kernels/Airy/kernel.Airy.R%d.dx%1.2f.dy%1.2f" % (R, dx, dy)
-        image = fromarray(rescaled)
-        image.save(name+".png")
-        scipy.save(name+".npy", kernel)
+    def full(self, shape):
+        """shape of the full linear convolution of a plane with the kernel"""
+        return tuple(shape[:-2]) + tuple(
+                s + k - 1 for s, k in zip(shape[-2:], self.kernel.shape))
+
+    #~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+    def choose(self, shape):
+        """choose 'direct' or 'fft' by comparing estimated operation counts"""
+        direct = float(scipy.prod(shape)) * self.kernel.size
+        points = float(scipy.prod(self.full(shape)))
+        fft    = 2.0 * Convolver.ratio * points * scipy.log2(points)
+        return 'fft' if fft < direct else 'direct'
+
+    #~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+    @property
+    def nbytes(self):
+        """bytes held by the kernel and its cached spectra"""
+        return self.kernel.nbytes + sum(
+                spectrum.nbytes for spectrum in self.spectra.values()) + sum(
+                columns.nbytes + rows.nbytes
+                for _, _, columns, rows in self.factors.values())
+
+    #~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+    def factor(self, budget=None):
+        """
+        fewest separable rank-1 passes whose sum approximates the kernel.
+        The error is the L1 norm of the residual kernel, which bounds
+        the error of any output pixel when planes lie within [0, 1].
+        Airy kernels are radially symmetric, so a few passes suffice.
+        """
+        budget = self.budget if budget is None else budget
+        if budget not in self.factors:
+            U, S, V = svd(self.kernel)
+            for rank in range(1, len(S) + 1):
+                columns = U[:, :rank] * sqrt(S[:rank])
+                rows    = V[:rank, :].T * sqrt(S[:rank])
+                error   = fabs(self.kernel - dot(columns, rows.T)).sum()
+                if error <= budget:
+                    break
+            self.factors[budget] = (rank, error, columns.T.copy(), rows.T.copy())
+        return self.factors[budget]
+
+    #~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+    def prepare(self, shape):
+        """compute the spectrum and passes for frames of shape ahead of time"""
+        self.spectrum(tuple(next_fast_len(n) for n in self.full(shape)[-2:]))
+        self.factor()
+
+    #~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+    def spectrum(self, fshape):
+        """kernel spectrum zero-padded to fshape, computed only once"""
+        if fshape not in self.spectra:
+            self.spectra[fshape] = rfftn(self.kernel, fshape)
+        return self.spectra[fshape]
+
+    #~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+    def __call__(self, source, mode='same', method='auto'):
+        """convolve source with the kernel as scipy.signal.convolve does"""
+        assert method in Convolver.methods
+        if method == 'auto':
+            method = self.choose(source.shape)
+        if method == 'direct':
+            kernel = self.kernel[(None,) * (source.ndim - 2)]
+            return convolve(source, kernel, mode=mode, method='direct')
+        if method == 'separable':
+            # O(rank * 2R) per pixel instead of O(4R*R).
+            # Airy kernels are odd (2R+1) so 'same' is centered exactly;
+            # 'full' pads the plane with R zeros and 'valid' crops R.
+            rank, error, columns, rows = self.factor()
+            R = [k // 2 for k in self.kernel.shape]
+            if mode == 'full':
+                source = pad(source,
+                        [(0, 0)] * (source.ndim - 2) + [(r, r) for r in R],
+                        'constant')
+            result = zeros(source.shape)
+            for column, row in zip(columns, rows):
+                term    = convolve1d(source, column, axis=-2, mode='constant')
+                result += convolve1d(term, row, axis=-1, mode='constant')
+            if mode == 'valid':
+                result = result[(Ellipsis,) + tuple(slice(r, n - r)
+                    for r, n in zip(R, result.shape[-2:]))]
+            return result
+        full   = self.full(source.shape)[-2:]
+        fshape = tuple(next_fast_len(n) for n in full)
+        axes   = (-2, -1)
+        result = irfftn(rfftn(source, fshape, axes) * self.spectrum(fshape),
+                fshape, axes)
+        if mode == 'full':
+            shape = full
+        elif mode == 'same':
+            shape = source.shape[-2:]
+        else:
+            shape = tuple(s - k + 1 for s, k in
+                    zip(source.shape[-2:], self.kernel.shape))
+        # Center the requested shape within the full result.
+        return result[(Ellipsis,) + tuple(slice((f-n)//2, (f-n)//2 + n)
+            for f, n in zip(full, shape))]
+
+###############################################################################
+class Zoom(object):
+    """
+    Zoom magnifies each plane of a (P, X, Y) stack about its center by
+    1/coeff, exactly as scipy.ndimage.affine_transform with prefilter=False
+    and mode='constant' does, but for all planes in one pass.
+    A zoom is separable, so each axis is a sparse matrix holding the
+    B-spline weights of order+1 mirrored neighbors per output pixel;
+    they are computed once per (coeffs, shape, order) and reused.
+    """
+
+    #~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+    def __init__(self, coeffs, shape, order=3):
+        P, X, Y    = shape
+        self.shape = shape
+        self.rows  = block_diag([Zoom.axis(X, c, order) for c in coeffs], 'csr')
+        self.cols  = block_diag([Zoom.axis(Y, c, order) for c in coeffs], 'csr')
+
+    #~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+    @staticmethod
+    def axis(n, c, order):
+        """(n, n) weights resampling one axis at c*i + n*(1-c)/2"""
+        x      = c * arange(n) + n * (1.0 - c) / 2.0
+        start  = scipy.floor(x if order % 2 else x + 0.5).astype(int)
+        start -= order // 2
+        inside = (x >= 0) & (x <= n - 1)   # zero outside the plane
+        rows, cols, weights = [], [], []
+        for j in range(order + 1):
+            k = start + j
+            w = bspline(x - k, order)
+            # neighbors beyond an edge are mirrored back into the plane
+            while n > 1 and ((k < 0) | (k >= n)).any():
+                k = scipy.where(k < 0, -k, k)
+                k = scipy.where(k >= n, 2 * n - 2 - k, k)
+            k = k if n > 1 else 0 * k
+            rows.append(arange(n)[inside])
+            cols.append(k[inside])
+            weights.append(w[inside])
+        return csr_matrix((scipy.concatenate(weights),
+            (scipy.concatenate(rows), scipy.concatenate(cols))), (n, n))
+
+    #~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+    @property
+    def nbytes(self):
+        return sum(m.data.nbytes + m.indices.nbytes + m.indptr.nbytes
+                for m in (self.rows, self.cols))
+
+    #~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+    def __call__(self, source, output=None):
+        """zoom every plane of source (into output when given)"""
+        P, X, Y = self.shape
+        temp    = self.rows.dot(source.reshape((P * X, Y)))
+        temp    = self.cols.dot(temp.reshape((P, X, Y)).transpose(
+            (0, 2, 1)).reshape((P * Y, X)))
+        temp    = temp.reshape((P, Y, X)).transpose((0, 2, 1))
+        if output is None:
+            return temp.astype(source.dtype)
+        output[...] = temp
+        return output
 
 #MMMMMMMMMMMMMMMMMMMMMMMMMMMMMMMMMMMMMMMMMMMMMMMMMMMMMMMMMMMMMMMMMMMMMMMMMMMMMM
 if __name__ == "__main__":
@@ -228,7 +485,103 @@ if __name__ == "__main__":
             aawf['aperture'] = a
             print "Aperture %f kernel radius=%6.3f" % (a, radius(**aawf))
 
-    human = Human(verbose=True, generate=True)
+    def test_convolver(tolerance=1e-9):
+        """FFT convolution must match direct convolution within tolerance"""
+        source = scipy.random.random((101, 101))
+        for R in (3, 10, 32):
+            kernel = scipy.load(
+                    "kernels/Airy/kernel.Airy.R%d.dx0.00.dy0.00.npy" % (R))
+            convolver = Convolver(kernel)
+            for mode in ('same', 'full', 'valid'):
+                direct = convolver(source, mode, 'direct')
+                fft    = convolver(source, mode, 'fft')
+                error  = fabs(direct - fft).max()
+                assert direct.shape == fft.shape and error < tolerance
+                # A stack of planes must match its planes one at a time.
+                planes = scipy.array([source, source[::-1], source.T])
+                for method in Convolver.methods:
+                    batch  = convolver(planes, mode, method)
+                    single = [convolver(plane, mode, method) for plane in planes]
+                    assert fabs(batch - single).max() < tolerance
+                print "R%-2d %-5s |direct-fft| = %.1e (auto: %s)" % (
+                        R, mode, error, convolver.choose(source.shape))
+
+    def test_separable(human):
+        """separable passes must stay within the error budget they report"""
+        source = scipy.random.random((101, 101))
+        for R in (3, 10, 32):
+            kernel = scipy.load(
+                    "kernels/Airy/kernel.Airy.R%d.dx0.00.dy0.00.npy" % (R))
+            convolver = Convolver(kernel / kernel.sum(), human.ignore)
+            for mode in ('same', 'full', 'valid'):
+                direct    = convolver(source, mode, 'direct')
+                separable = convolver(source, mode, 'separable')
+                rank, error, _, _ = convolver.factor()
+                actual    = fabs(direct - separable).max()
+                assert direct.shape == separable.shape
+                assert error <= human.ignore and actual <= error + 1e-12
+                print "R%-2d %-5s rank=%d error=%.1e |direct-separable| = %.1e" % (
+                        R, mode, rank, error, actual)
+
+    def test_zoom(tolerance=1e-6):
+        """Zoom must match affine_transform plane by plane at every order"""
+        source = scipy.random.random((3, 61, 61))
+        coeffs = (0.9, 1.0, 1.1)
+        for order in range(6):
+            zoom  = Zoom(coeffs, source.shape, order)
+            error = max(fabs(zoom(source)[n] - affine_transform(
+                source[n], [[c, 0.0], [0.0, c]], offset=[61*(1.0-c)/2.0]*2,
+                order=order, prefilter=False)).max()
+                for n, c in enumerate(coeffs))
+            assert error < tolerance
+            print "zoom order %d |zoom-affine_transform| = %.1e" % (
+                    order, error)
+
+    def test_genAiry(human, epsilon=1e-15):
+        """kernels must match those stored in kernels/Airy within epsilon"""
+        import time
+        def loops(dx, dy, w, a, **kw):
+            """the per-pixel, per-picket loop genAiry used before"""
+            um               = 1e-6
+            kw['aperture'  ] = a
+            kw['wavelength'] = w
+            R              = human.kernelRadius(**kw)
+            R1             = R + 1
+            edge           = 1 + 2 * R1
+            radii          = zeros((edge, edge), float)
+            accum          = zeros((edge, edge), float)
+            sequence       = [(X, Y, um*float(X-R1), um*float(Y-R1))
+                    for X, Y in list(itertools.product(range(edge), repeat=2))]
+            for ex, ey in array(human.pickets.data) * um:
+                for X, Y, x, y in sequence:
+                    radii[X,Y] = sqrt((x+dx+ex)**2 + (y+dy+dy)**2)
+                kw['radius'] = radii
+                component  = human.wave(**kw)
+                component[radii > (R*um)] = 0.0
+                accum     += component
+            accum         /= sqrt((accum ** 2).sum())
+            return accum
+        w, a   = 534e-9, 7e-3
+        stored = scipy.load("kernels/Airy/kernel.Airy.R5.dx0.00.dy0.00.npy")
+        R      = (stored.shape[0] - 3) // 2
+        times  = {}
+        for name, make in (('loops', loops), ('new', human.makeAiry)):
+            t0     = time.time()
+            kernel = make(0.0, 0.0, w, a)
+            times[name] = time.time() - t0
+            error  = fabs(kernel - stored).max()
+            assert kernel.shape == stored.shape and error < epsilon
+            print "genAiry R%d %-5s in %.4f seconds |%s-stored| = %.1e" % (
+                    R, name, times[name], name, error)
+        print "genAiry R%d new is %.1f times faster than loops" % (
+                R, times['loops'] / times['new'])
+
+    human = Human(verbose=True)
+
+    test_genAiry(human)
+    human = Human(verbose=True, generate=True, png=True)
 
     test_kernel_radius(human)
-    #human.save()
+    test_convolver()
+    test_separable(human)
+    test_zoom()
@@ -52,6 +52,7 @@ class Logger(object):
     logger = logging.getLogger(sys.argv[0])
     logname, level = None, 0
     #xmltab, xmlname, xmlstream = 0, None, None
+    modules = {}    # module names keyed by code object (see _whoami)
     now = time.gmtime()
     timestamp = str(now.tm_year)
     # CAUTION: This formatter must not change if test_Logger.py is to succeed.
@@ -132,7 +133,7 @@ class Logger(object):
         return Logger.logname
 
     def whoami(self, level=1):
-        self.debug(inspect.stack()[level][3])
+        self.debug(sys._getframe(level).f_code.co_name)
 
     def _whoami(self):
         """
@@ -141,11 +142,16 @@ to establish the name of the calling function
 the name of its module, and the line number of the call,
 and the elapsed time since the last _whoami.
 """
-        frame_records = inspect.stack()[2]
-        module_name = inspect.getmodulename(frame_records[1])
-        method_name = frame_records[3]
-        frame,fname,lnum,fun,lines,ind = inspect.getouterframes(
-                inspect.currentframe())[2]
+        # The caller of debug/info/... is two frames up.  Only its code
+        # object and line are read; no source is loaded for the stack.
+        frame = sys._getframe(2)
+        code = frame.f_code
+        module_name = Logger.modules.get(code)
+        if module_name is None:
+            module_name = Logger.modules[code] = inspect.getmodulename(
+                    code.co_filename)
+        method_name = code.co_name
+        lnum = frame.f_lineno
         t1 = time.time()
         dt = t1 - Logger.t0
         Logger.t0 = t1
@@ -174,36 +180,42 @@ and the elapsed time since the last _whoami.
 
     def xml(self, msg):
         # TODO XML output unimplemented
-        tag = inspect.stack()[1][3]
+        tag = sys._getframe(1).f_code.co_name
         #print>>Logger.xmlstream, '<%s "%s"/>' % (tag, msg)
 
     def debug( self, msg, *args, **kw):
         self.required()
+        if not Logger.logger.isEnabledFor(logging.DEBUG): return
         color = Logger.color['debug']
         self.xml(msg)
         Logger.logger.debug( color(self._whoami()+msg), *args, **kw)
     def info( self, msg, *args, **kw):
         self.required()
+        if not Logger.logger.isEnabledFor(logging.INFO): return
         color = Logger.color['info']
         self.xml(msg)
         Logger.logger.info( color(self._whoami()+msg), *args, **kw)
     def warning( self, msg, *args, **kw):
         self.required()
+        if not Logger.logger.isEnabledFor(logging.WARNING): return
         color = Logger.color['warning']
         self.xml(msg)
         Logger.logger.warning( color(self._whoami()+msg), *args, **kw)
     def error( self, msg, *args, **kw):
         self.required()
+        if not Logger.logger.isEnabledFor(logging.ERROR): return
         color = Logger.color['error']
         self.xml(msg)
         Logger.logger.error( color(self._whoami()+msg), *args, **kw)
     def critical( self, msg, *args, **kw):
         self.required()
+        if not Logger.logger.isEnabledFor(logging.CRITICAL): return
         color = Logger.color['critical']
         self.xml(msg)
         Logger.logger.critical( color(self._whoami()+msg), *args, **kw)
     def log( self, lvl, msg, *args, **kw):
         self.required()
+        if not Logger.logger.isEnabledFor(lvl): return
         self.xml(msg)
         Logger.logger.log( lvl, self._whoami()+msg, *args, **kw)
     def setLevel( self, lvl):
@@ -29,10 +29,12 @@ Exception classes: None
 
 Functions:
 
+- `scipyMethod`
 - `addscipy`
 - `scipyFunctions`
 - `scipyConstants`
 - `unittest`
+- `benchmark`
 - `calculator`
 - `capture`
 - `illegal`
@@ -74,6 +76,9 @@ How To Use This Module
    a) Run unit tests
       - `./RPN.py --mode=unittest`
 
+   b) Time token dispatch
+      - `./RPN.py --mode=benchmark`
+
 3. Run it as a desktop image filter.
 
    a) Show default window with no filter.
@@ -90,27 +95,31 @@ __docformat__ = 'restructuredtext'
 
 ###############################################################################
 # RPN.py a reverse polish notation calculator using scipy on aggregates.
-# Operates in three modes:
+# Operates in five modes:
 # 1. Calculator mode is default for general calculation use.
 # 2. Capture    mode uses Capture.py to filter screen input to output.
 # 3. UnitTest   mode exercises almost the entire suite of code.
+# 4. Benchmark  mode times token dispatch and per-frame allocation.
+# 5. Offline    mode filters Capture.py frame sources into sinks headless.
 ###############################################################################
 
 # Try the following input where '\ ' is the prompt:
 
 ###############################################################################
 # IMPORTS
-import os, sys, scipy, inspect, traceback, types, scipy.constants
+import os, sys, time, hashlib, numpy, scipy, inspect, traceback, types
+import scipy.constants
 
 from copy                           import deepcopy, copy
+from collections                    import OrderedDict
 from pprint                         import pprint
 from optparse                       import OptionParser
-from itertools                      import product
 from scipy.signal                   import convolve
-from scipy.ndimage.interpolation    import affine_transform
 
 # IMPORTS from this suite
-from Diffract                       import Human
+from Diffract                       import Human, Convolver, Zoom
+from Device                         import Device
+from Border                         import Border
 
 ###############################################################################
 #TODO commented out names require more development.
@@ -157,26 +166,16 @@ arg2 = [
 """NAMES OF FUNCTIONS OF 2 PARAMETERS from scipy"""
 
 ###############################################################################
-# Generate scipy wrapper functions prefixed with 'F_' external.
-# Insert them as class functions without the 'F_' prefix.
-# Although it is generally considered a bad idea to use eval/exec,
-# These interpreter formats enable creation of additional CLASS methods.
-# class methods are preferred over instance methods.
-fmtf = 'RPN.%s = F_%s'
-fmtc = ['def F_%s(self): self.internal_push(scipy.constants.%s)',fmtf]
-fmtp = [
-    'def F_%s(self): ' +
-    'self.internal_push(scipy.constants.constants.%s)',
-    fmtf]
-fmt1 = [
-    'def F_%s(self): self.internal_push(scipy.%s(self.internal_pop()))',
-    fmtf]
-fmt2 = [
-    'def F_%s(self): ' +
-    'a=self.internal_pop();' +
-    'self.internal_push(scipy.%s(self.internal_pop(),a))',
-    fmtf]
-"""EVAL FORMATS FOR INSERTING FUNCTIONS AND CONSTANTS from scipy"""
+# Scipy functions and constants are dispatched through RPN.registry.
+# addscipy() maps each name to a prebuilt (callable, arity) pair once.
+# Class methods of the same names are built from the same pairs,
+# so dir(self), help, and direct calls such as rpn.sqrt() still work.
+suites = [
+    (argc, scipy.constants          , 0),
+    (argp, scipy.constants.constants, 0),
+    (arg1, scipy                    , 1),
+    (arg2, scipy                    , 2),]
+"""SOURCE MODULES AND ARITIES FOR FUNCTIONS AND CONSTANTS from scipy"""
 
 ###############################################################################
 # SUPPORT for special interpreter symbols
@@ -233,6 +232,143 @@ class Number(Function):
         kw['rpn'].internal_push(l)
         return True
 
+#CCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCC
+class Stack(object):
+    """
+    Stack keeps its top at the end of a list so push and pop are O(1).
+    Indexing, iteration, and repr present the top of stack first,
+    so stack[0] is the top as it was when the stack was a list.
+    """
+
+    def __init__(self, items=()):
+        self.items = list(items)[::-1]
+
+    def __len__(self):
+        return len(self.items)
+
+    def __iter__(self):
+        return reversed(self.items)
+
+    def __repr__(self):
+        return repr(list(self))
+
+    def __getitem__(self, n):
+        if isinstance(n, slice):
+            return list(self)[n]
+        N = len(self.items)
+        if n < 0:
+            n += N
+        if not 0 <= n < N:
+            raise IndexError('stack index out of range')
+        return self.items[N-1-n]
+
+    def push(self, item):
+        self.items.append(item)
+
+    def pop(self):
+        return self.items.pop()
+
+    def peek(self, n=0):
+        return self[n]
+
+    def dup(self):
+        self.items.append(self[0])
+
+    def swap(self):
+        items = self.items
+        items[-1], items[-2] = items[-2], items[-1]
+
+    def rot(self):
+        """a b c -> b c a where c is the top"""
+        items = self.items
+        items[-3], items[-2], items[-1] = items[-2], items[-1], items[-3]
+
+    def drop(self, n=1):
+        if not 0 <= n <= len(self.items):
+            raise IndexError('drop %d from stack of %d' % (n, len(self.items)))
+        if n:
+            del self.items[-n:]
+
+    def pick(self, n):
+        self.items.append(self[n])
+
+#CCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCC
+class Pool(object):
+    """
+    Pool recycles scratch arrays of a given (shape, dtype) between frames.
+    An array is free again when nothing but the pool refers to it.
+    Freedom is judged by CPython reference counts, so --inplace
+    (which uses the pool) is opt-in: it saves allocations, but on frames
+    of radius 200 and more it measured slower than allocating.
+    """
+
+    def __init__(self, depth=8):
+        self.depth  = depth     # Most arrays kept for any one (shape, dtype)
+        self.arrays = {}
+        self.ids    = set()     # Identities of the arrays kept
+
+    def references(self, array):
+        """number of references the pool itself holds to array"""
+        return 1 if id(array) in self.ids else 0
+
+    def __call__(self, shape, dtype):
+        """return (array, reused) where array is uninitialized scratch"""
+        arrays = self.arrays.setdefault((shape, dtype), [])
+        for array in arrays:
+            # References: the list, the loop variable, getrefcount itself.
+            if sys.getrefcount(array) == 3:
+                return array, True
+        array = numpy.empty(shape, dtype)
+        if len(arrays) < self.depth:
+            arrays.append(array)
+            self.ids.add(id(array))
+        return array, False
+
+#CCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCC
+class Cache(object):
+    """
+    Cache maps keys to values, evicting least recently used values
+    once the bytes they hold, as measured by sizeof, exceed limit.
+    The most recent value is always kept, even if it alone is too big.
+    Values may grow after they are made (a Convolver caches spectra),
+    so a value is measured again on every hit and by measure().
+    """
+
+    def __init__(self, limit, sizeof):
+        self.limit   = limit
+        self.sizeof  = sizeof
+        self.entries = OrderedDict()    # key: (value, bytes), oldest first
+        self.size    = 0
+        self.stats   = {'hits': 0, 'misses': 0, 'evictions': 0}
+
+    def __call__(self, key, make):
+        """return the value for key, calling make() only on a miss"""
+        if key in self.entries:
+            self.stats['hits'] += 1
+            value, nbytes = self.entries.pop(key)
+            self.size -= nbytes
+        else:
+            self.stats['misses'] += 1
+            value = make()
+        self.entries[key] = (value, self.sizeof(value))
+        self.size += self.entries[key][1]
+        self.evict()
+        return value
+
+    def measure(self):
+        """size every value again, then evict down to the limit"""
+        for key, (value, nbytes) in self.entries.items():
+            self.entries[key] = (value, self.sizeof(value))
+        self.size = sum(nbytes for _, nbytes in self.entries.values())
+        self.evict()
+
+    def evict(self):
+        """drop least recently used values until size is within limit"""
+        while self.size > self.limit and len(self.entries) > 1:
+            oldest, (_, nbytes) = self.entries.popitem(last=False)
+            self.size -= nbytes
+            self.stats['evictions'] += 1
+
 #CCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCC
 class RPN(object):
     """
@@ -295,33 +431,145 @@ class RPN(object):
     #pppppppppppppppppppppppppppppppppppppppppppppppppppppppppppppppppppppppppp
     def internal_push(self, item):
         """put a value on the stack"""
-        self.stack = [item,] + self.stack
+        self.stack.push(item)
 
     #pppppppppppppppppppppppppppppppppppppppppppppppppppppppppppppppppppppppppp
     def internal_pop(self):
         """recover a value by popping it from the stack"""
-        a = self.stack[:1][0]
-        self.stack = self.stack[1:]
-        return a
+        return self.stack.pop()
+
+    #pppppppppppppppppppppppppppppppppppppppppppppppppppppppppppppppppppppppppp
+    def internal_store(self, name):
+        """pop a value from the stack and bind it to a symbol"""
+        self.symbol[-1][name] = self.internal_pop()
+
+    #pppppppppppppppppppppppppppppppppppppppppppppppppppppppppppppppppppppppppp
+    def internal_array(self, value):
+        """push a fresh scipy array built from a compiled literal"""
+        self.internal_push(scipy.array(value, float))
+
+    #pppppppppppppppppppppppppppppppppppppppppppppppppppppppppppppppppppppppppp
+    def internal_call(self, name):
+        """execute a function defined using ':'"""
+        self.internal_interpret(self.symbol[-1][name])
+
+    #pppppppppppppppppppppppppppppppppppppppppppppppppppppppppppppppppppppppppp
+    def internal_word(self, name, code):
+        """push the value of a symbol, otherwise evaluate as raw python"""
+        symbol = self.symbol[-1]
+        if name in symbol:
+            self.internal_push(symbol[name])
+        else:
+            eval(code if code else name)
+
+    #pppppppppppppppppppppppppppppppppppppppppppppppppppppppppppppppppppppppppp
+    def internal_raise(self, error):
+        """replay an error found while compiling an instruction"""
+        raise error
+
+    #pppppppppppppppppppppppppppppppppppppppppppppppppppppppppppppppppppppppppp
+    def internal_apply(self, function, arity):
+        """pop arity operands, push function of them (top is the last arg)"""
+        if arity == 0:
+            self.internal_push(function())
+            return
+        # A refcount of 2 (this local and getrefcount) plus any pool
+        # reference means that nothing else, neither a symbol nor another
+        # stack slot, holds the operand.
+        pooled = self.pool.references
+        a = self.internal_pop()
+        if arity == 1:
+            operands, free = (a,), (sys.getrefcount(a) == 2 + pooled(a),)
+        else:
+            b = self.internal_pop()
+            free = (sys.getrefcount(b) == 2 + pooled(b),
+                    sys.getrefcount(a) == 2 + pooled(a))
+            operands = (b, a)
+        if self.inplace and isinstance(function, numpy.ufunc):
+            out = self.internal_out(operands, free)
+            if out is not None:
+                self.internal_push(function(*operands, out=out))
+                return
+        result = function(*operands)
+        if isinstance(result, numpy.ndarray):
+            self.memstats['allocated'] += 1
+        self.internal_push(result)
+
+    #pppppppppppppppppppppppppppppppppppppppppppppppppppppppppppppppppppppppppp
+    def internal_out(self, operands, free):
+        """choose a ufunc output: a disposable operand or a pooled array"""
+        if not [x for x in operands if isinstance(x, numpy.ndarray)]:
+            return None
+        dtype = numpy.result_type(*operands)
+        if dtype.kind not in 'fc':
+            return None
+        shape = numpy.broadcast(*operands).shape
+        for operand, alone in zip(operands, free):
+            if (alone and isinstance(operand, numpy.ndarray) and
+                    operand.shape == shape and operand.dtype == dtype and
+                    operand.flags.owndata and operand.flags.writeable):
+                self.memstats['inplace'] += 1
+                return operand
+        return self.internal_scratch(shape, dtype)
+
+    #pppppppppppppppppppppppppppppppppppppppppppppppppppppppppppppppppppppppppp
+    def internal_scratch(self, shape, dtype):
+        """get an uninitialized array from the pool and count the outcome"""
+        array, reused = self.pool(shape, dtype)
+        self.memstats['pooled' if reused else 'allocated'] += 1
+        return array
+
+    #~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+    def internal_read(self, path):
+        """return the lines of a codefile, rereading only when it changed"""
+        status = os.stat(path)
+        stamp  = (status.st_mtime, status.st_size)
+        cached = self.loaded.get(path, None)
+        if cached and cached[0] == stamp:
+            self.loadstats['hits'] += 1
+            return cached[2]
+        # A touched file is read and hashed again, so it counts as a miss.
+        # Compiling is left to internal_interpret, which caches opcodes.
+        self.loadstats['misses'] += 1
+        t0 = time.time()
+        with open(path) as codefile:
+            code = codefile.readlines()
+        digest = hashlib.md5(''.join(code)).hexdigest()
+        if cached and cached[1] == digest:
+            # Touched but not edited: keep the lines already compiled.
+            code = cached[2]
+        self.loaded[path] = (stamp, digest, code)
+        self.loadstats['seconds'] += time.time() - t0
+        return code
 
     #~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
     def internal_load(self, filename):
         found = False
         for directory in self.directories:
             try:
-                with open(os.path.join(directory, filename)) as codefile:
-                    self.code = codefile.readlines()
+                self.code = self.internal_read(os.path.join(directory, filename))
                 found = True
-                # execute instructions from codefile
-                self.internal_interpret(self.code)
-            except:
-                pass
-            if found:
-                break
+            except (IOError, OSError):
+                continue
+            # execute instructions from codefile
+            self.internal_interpret(self.code)
+            break
         if not found:
             print 'Failed to load:', filename
         return found
 
+    #~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+    def version(self, **kw):
+        """stat of the codefile __call__ loads, so callers see it change"""
+        filename = kw.get('rpn', 'capture.rpn')
+        for directory in self.directories:
+            try:
+                status = os.stat(os.path.join(directory, filename))
+            except OSError:
+                continue
+            return (status.st_mtime, status.st_size)
+        return None
+
     #~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
     def __init__(self, **kw):
         """Initialize RPN instance"""
@@ -337,25 +585,44 @@ class RPN(object):
         self.kernelX, self.kernelY = (0, 0) # Radius of kernel in X and Y
         self.directories           = ['.', './rpn'] # impodt directories
         self.classNumber           = Number()
-        # Prepare to find maximum kernel radius for mask
-        self.kradius               = 0
+        self.compiled              = Cache( # opcodes keyed by source code
+                kw.get('compiledops', 1 << 16),
+                lambda entry: 1 + len(entry[0]))
+        self.branches              = [      # key characters of branches
+                (name, RPN.functions[name](self)) for name in RPN.sequence
+                if name not in RPN.words]
+        self.loaded                = {}     # codefile lines keyed by path
+        self.loadstats             = {'hits': 0, 'misses': 0, 'seconds': 0.0}
+        self.inplace               = kw.get('inplace', False) # see Pool
+        self.pool                  = Pool()
+        self.memstats              = {'inplace':0, 'pooled':0, 'allocated':0}
+        self.kernels               = Cache( # (kernel, convolver, Gauss)
+                kw.get('kernelbytes', 64 << 20),
+                lambda entry: sum(item.nbytes for item in entry))
+        self.zooms                 = Cache( # Zoom weights
+                kw.get('zoombytes', 16 << 20), lambda zoom: zoom.nbytes)
+        # Edge policies for diffract and --ready (see Border.py)
+        self.borders               = {}     # (policy, width): Border
         self.ready                 = kw.get('ready', False)
+        # --gpgpu runs convolve/normalize/zoom in OpenCL (or CPU fallback).
+        self.device                = Device(**kw) if kw.get('gpgpu') else None
         #print '\t\tRPN', self.kw
 
     #()()()()()()()()()()()()()()()()()()()()()()()()()()()()()()()()()()()()()
     def __call__(self, source, **kw):
         """entrypoint for image filtration using Capture.py"""
 
-        if source == None:
+        if source is None:
             #This is how oversize is returned
-            #TODO figure out why the edge reflection still exists.
-            return (self.kernelX, self.kernelY)
+            return self.internal_margin()
 
         # put R=0, G=1, B=2 into symbol table
         for n, letter in enumerate('RGB'): self.symbol[-1][letter] = n
         # put original Capture.py source array as planes into symbol table
         self.symbol[-1]['Rs'], self.symbol[-1]['Gs'], self.symbol[-1]['Bs'] = (
                 source)
+        # and as one (3, X, Y) stack for programs that run once on all planes
+        self.symbol[-1]['Ss'] = source
 
         # Put dimensions into the symbol table
         self.shape                = (self.W, self.X, self.Y) = source.shape
@@ -372,24 +639,32 @@ class RPN(object):
             'Bw':420e-9,    # Blue
             'Uw':390e-5,    # Ultraviolet
             })
+        # Per-plane wavelengths broadcast against the (3, X, Y) stack
+        self.symbol[-1]['Sw'] = scipy.array(
+                [self.symbol[-1][plane+'w'] for plane in 'RGB']).reshape(3,1,1)
 
         # recover Rt, Gt, Bt target color planes from interpreter
         RGB = [self.symbol[-1].get('%ct' % (plane), None) for plane in 'RGB']
+        # a stacked program leaves St as its target; no planes to restack.
+        if self.symbol[-1].get('St', None) is not None:
+            self.symbol[-1]['target']    = self.symbol[-1]['St']
         # if all three planes were generated, construct the target array
-        if RGB[0] != None and RGB[1] != None and RGB[2] != None:
+        elif RGB[0] is not None and RGB[1] is not None and RGB[2] is not None:
             self.symbol[-1]['target']    = scipy.array(RGB)
 
-        # read codefile every time to pick up changes dynamically.
+        # check codefile every time to pick up changes dynamically.
+        # It is only reread when its mtime or size changes (see loadstats).
         filename = kw['filename'] = kw.get('rpn', 'capture.rpn')
         self.interpret_load('!', filename)
         self.first = False
 
         # return generated target array or source array to Capture.py
+        # less the oversize margin Capture.Panel.position added for --ready.
+        target = self.symbol[-1].get('target', source)
         if self.ready:
-            dx, dy = self.kernelX, self.kernelY
-            target = self.symbol[-1].get('target', source)[dx:-dx, dy:-dy]
-        else:
-            return self.symbol[-1].get('target', source)
+            target = self.internal_border('crop', self.internal_margin())(
+                    target)
+        return target
 
     #~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
     def internal_whoami(self, c='', r=''):
@@ -502,7 +777,7 @@ class RPN(object):
         filename = r if r else self.internal_pop()
         if not filename.endswith('.rpn'):
             filename += '.rpn'
-            self.internal_load(filename)
+        self.internal_load(filename)
         return True
 
     #iiiiiiiiiiiiiiiiiiiiiiiiiiiiiiiiiiiiiiiiiiiiiiiiiiiiiiiiiiiiiiiiiiiiiiiiii
@@ -510,9 +785,7 @@ class RPN(object):
         """pop a number of items from the stack"""
         (k, ret, line)  = self.interpret_generic(c, r, '_')
         if k or not ret: return k if k else ret
-        n = self.pop()
-        for i in range(n):
-            self.pop()
+        self.dropn()
         return True
 
     #iiiiiiiiiiiiiiiiiiiiiiiiiiiiiiiiiiiiiiiiiiiiiiiiiiiiiiiiiiiiiiiiiiiiiiiiii
@@ -520,7 +793,7 @@ class RPN(object):
         """convert +-*/^ to scipy names and execute"""
         (k, ret, line)  = self.interpret_generic(c, r, arith.keys())
         if k or not ret: return k if k else ret
-        eval('self.%s()' % (arith[c]))
+        self.internal_apply(*RPN.registry[arith[c]])
         return True
 
     #iiiiiiiiiiiiiiiiiiiiiiiiiiiiiiiiiiiiiiiiiiiiiiiiiiiiiiiiiiiiiiiiiiiiiiiiii
@@ -555,7 +828,7 @@ class RPN(object):
         if not c: return key
         if not c+r in key: return False
         self.internal_whoami(c+r)
-        eval('self.%s()' % (c+r))
+        getattr(self, c+r)()
         return True
 
     #iiiiiiiiiiiiiiiiiiiiiiiiiiiiiiiiiiiiiiiiiiiiiiiiiiiiiiiiiiiiiiiiiiiiiiiiii
@@ -585,47 +858,155 @@ class RPN(object):
             if function(self, first, rest):
                 break
 
-    #IIIIIIIIIIIIIIIIIIIIIIIIIIIIIIIIIIIIIIIIIIIIIIIIIIIIIIIIIIIIIIIIIIIIIIIIII
-    # The primary method to call with a string to interpret.
-    def internal_interpret(self, code):
-        """execute one or many .rpn instructions"""
+    # Compiler
+    # Instructions are resolved once to (text, callable, args) opcodes.
+    # The same choice internal_execute makes on every run is made here,
+    # using the key characters each interpret_* branch reports about itself.
+    #cccccccccccccccccccccccccccccccccccccccccccccccccccccccccccccccccccccccccc
+    def compile_comment(self, first, rest):
+        """comments generate no opcodes"""
+        return []
+
+    #cccccccccccccccccccccccccccccccccccccccccccccccccccccccccccccccccccccccccc
+    def compile_multipart(self, first, rest):
+        """flatten (a|b|c) into the enclosing program"""
+        line = (first+rest).strip()
+        if line[0] != '(' or line[-1] != ')':
+            return []
+        inside = line[1:-1]
+        if inside[0] in self.interpret_define():
+            return [(line, self.interpret_define, (inside[0], inside[1:]))]
+        return self.internal_compile(
+                [item.strip() for item in inside.split('|')])
+
+    #cccccccccccccccccccccccccccccccccccccccccccccccccccccccccccccccccccccccccc
+    def compile_number(self, first, rest):
+        """push-float opcode with the float converted once"""
+        line = (first+rest).strip()
+        return [(line, self.internal_push, (float(line),))]
+
+    #cccccccccccccccccccccccccccccccccccccccccccccccccccccccccccccccccccccccccc
+    def compile_symbol(self, first, rest):
+        """store opcode"""
+        return [(first+rest, self.internal_store, (rest,))]
+
+    #cccccccccccccccccccccccccccccccccccccccccccccccccccccccccccccccccccccccccc
+    def compile_array(self, first, rest):
+        """push-array opcode with the literal evaluated once"""
+        return [(first+rest, self.internal_array, (eval(first+rest),))]
+
+    #cccccccccccccccccccccccccccccccccccccccccccccccccccccccccccccccccccccccccc
+    def compile_squote(self, first, rest):
+        """push-name opcode"""
+        return [(first+rest, self.internal_push, (rest,))]
+
+    #cccccccccccccccccccccccccccccccccccccccccccccccccccccccccccccccccccccccccc
+    def compile_arithmetic(self, first, rest):
+        """call-method opcode for +-*/^ taken from the scipy registry"""
+        return [(first+rest, self.internal_apply, RPN.registry[arith[first]])]
+
+    #cccccccccccccccccccccccccccccccccccccccccccccccccccccccccccccccccccccccccc
+    def compile_call(self, first, rest):
+        """call-defined-function opcode"""
+        return [(first+rest, self.internal_call, (rest,))]
+
+    #cccccccccccccccccccccccccccccccccccccccccccccccccccccccccccccccccccccccccc
+    def compile_quit(self, first, rest):
+        """quit opcode"""
+        return [(first+rest, sys.exit, (0,))]
+
+    #cccccccccccccccccccccccccccccccccccccccccccccccccccccccccccccccccccccccccc
+    def compile_word(self, first, rest):
+        """call-method opcode, or push-symbol/raw python resolved at runtime"""
+        line = first+rest
+        if line in RPN.registry:
+            return [(line, self.internal_apply, RPN.registry[line])]
+        if line in dir(self):
+            method = getattr(self, line)
+            if callable(method):
+                return [(line, method, ())]
+            return [(line, self.interpret_function, (first, rest))]
+        try:
+            code = compile(line, '<rpn>', 'eval')
+        except SyntaxError:
+            code = None
+        return [(line, self.internal_word, (line, code))]
+
+    #~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+    def internal_translate(self, first, rest):
+        """choose the interpreter branch once and return its opcodes"""
+        for name, key in self.branches:
+            if first in key:
+                if name in RPN.compilers:
+                    return RPN.compilers[name](self, first, rest)
+                # Rarely used branches keep their interpret_* implementation.
+                return [(first+rest, getattr(self, name), (first, rest))]
+        return self.compile_word(first, rest)
+
+    #~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+    def internal_instruction(self, code):
+        """compile a single instruction, honoring continuation lines"""
+        code = code.strip()
+        if not code or code[0] == '#':
+            return []
+
+        # get first character and the remaining string
+        if self.extended_input != '':
+            # The space prevents accidental token appending.
+            code = self.extended_input + ' ' + code
+
+        first, rest = code[:1], code[1:]
+        # eliminate inline comment after instruction
+        rest = (rest.split('#')[0] if '#' in rest else rest).strip()
+        if rest != '':
+            t = rest[-1]
+            if t in '|,':
+                self.extended_input = first + rest
+                return []
+
+        self.extended_input = ''
+        try:
+            return self.internal_translate(first, rest)
+        except Exception as e:
+            # Report the failure each time the instruction is reached.
+            return [(code, self.internal_raise, (e,))]
+
+    #~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+    def internal_split(self, code):
+        """fragment a list or multiline string into single instructions"""
         if isinstance(code, types.ListType):
-            """fragment a list and execute each instruction"""
-            if code:
-                for item in code:
-                    self.internal_interpret(item)
+            for item in code:
+                for single in self.internal_split(item):
+                    yield single
         elif '\n' in code:
-            """fragment a string and execute each instruction"""
-            for single in [one.strip() for one in code.split('\n')]:
-                self.internal_interpret(single)
+            for one in code.split('\n'):
+                for single in self.internal_split(one.strip()):
+                    yield single
         elif code:
+            yield code
+
+    #~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+    def internal_compile(self, code):
+        """translate .rpn instructions to a cached flat list of opcodes"""
+        text = tuple(code) if isinstance(code, types.ListType) else code
+        key  = (self.extended_input, text)
+        def make():
+            program = []
+            for single in self.internal_split(code):
+                program += self.internal_instruction(single)
+            return (program, self.extended_input)
+        program, self.extended_input = self.compiled(key, make)
+        return program
+
+    #~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+    def internal_run(self, program):
+        """execute compiled opcodes in order"""
+        for text, function, args in program:
+            self.depth += 1
             try:
-                self.depth += 1
-                """execute a single instruction"""
                 if self.verbose:
-                    print code
-
-                code = code.strip()
-                if code[0] == '#':
-                    return self
-
-                # get first character and the remaining string
-                if self.extended_input != '':
-                    # The space prevents accidental token appending.
-                    code = self.extended_input + ' ' + code
-
-                first, rest = code[:1], code[1:]
-                # eliminate inline comment after instruction
-                rest = (rest.split('#')[0] if '#' in rest else rest).strip()
-                if rest != '':
-                    t = rest[-1]
-                    if t in '|,':
-                        self.extended_input = first + rest
-                        return self
-
-                self.extended_input = ''
-                # execute interpreter instruction
-                self.internal_execute(first, rest)
+                    print text
+                function(*args)
                 self.iteration += 1
             except Exception as e:
                 print e
@@ -633,13 +1014,19 @@ class RPN(object):
                 self.depth -= 1
         return self
 
+    #IIIIIIIIIIIIIIIIIIIIIIIIIIIIIIIIIIIIIIIIIIIIIIIIIIIIIIIIIIIIIIIIIIIIIIIIII
+    # The primary method to call with a string to interpret.
+    def internal_interpret(self, code):
+        """execute one or many .rpn instructions"""
+        return self.internal_run(self.internal_compile(code))
+
     # Primitives
     # These functions are visible as interpreter keywords
     #pppppppppppppppppppppppppppppppppppppppppppppppppppppppppppppppppppppppppp
     def clear(self):
         """reset the instance for a new interpreter run"""
         self.symbol=[{}]
-        self.stack=[]
+        self.stack=Stack()
         self.verbose = False
         self.change = True
 
@@ -650,7 +1037,8 @@ class RPN(object):
         printlist = []
         local_suite = [
                 'show',
-                'zoom', 'diffract',
+                'dup', 'swap', 'rot', 'drop', 'dropn', 'pick',
+                'zoom', 'diffract', 'kernelstats',
                 'negative', 'normalize']
         for key, fun in RPN.functions.iteritems():
             """executing the function with no parameters returns the keys"""
@@ -681,12 +1069,11 @@ class RPN(object):
                             name),]
                     elif name in argc:
                         printlist += [ '%-20s # from scipy suite (%e)' % (
-                                name, eval('scipy.constants.%s' %
-                                    (name))),]
+                                name, getattr(scipy.constants, name)),]
                     elif name in argp:
                         printlist += [ '%-20s # from scipy suite (%e)' % (
-                                name, eval('scipy.constants.constants.%s' %
-                                    (name))),]
+                                name, getattr(
+                                    scipy.constants.constants, name)),]
                     elif name in scipy_suite:
                         printlist += [ '%-20s # from scipy suite' % (name),]
                     elif name in quits:
@@ -712,6 +1099,36 @@ class RPN(object):
         """show the top of the stack"""
         print self.stack[0]
 
+    #pppppppppppppppppppppppppppppppppppppppppppppppppppppppppppppppppppppppppp
+    def dup(self):
+        """push the top of the stack again"""
+        self.stack.dup()
+
+    #pppppppppppppppppppppppppppppppppppppppppppppppppppppppppppppppppppppppppp
+    def swap(self):
+        """exchange the top two items of the stack"""
+        self.stack.swap()
+
+    #pppppppppppppppppppppppppppppppppppppppppppppppppppppppppppppppppppppppppp
+    def rot(self):
+        """bring the third item of the stack to the top"""
+        self.stack.rot()
+
+    #pppppppppppppppppppppppppppppppppppppppppppppppppppppppppppppppppppppppppp
+    def drop(self):
+        """discard the top of the stack"""
+        self.stack.drop()
+
+    #pppppppppppppppppppppppppppppppppppppppppppppppppppppppppppppppppppppppppp
+    def dropn(self):
+        """pop a count n, then discard n items from the stack"""
+        self.stack.drop(int(self.internal_pop()))
+
+    #pppppppppppppppppppppppppppppppppppppppppppppppppppppppppppppppppppppppppp
+    def pick(self):
+        """pop an index n, then push a copy of item n (0 is the top)"""
+        self.stack.pick(int(self.internal_pop()))
+
     # Enhanced functions
     # These functions are visible as interpreter keywords
     #eeeeeeeeeeeeeeeeeeeeeeeeeeeeeeeeeeeeeeeeeeeeeeeeeeeeeeeeeeeeeeeeeeeeeeeeee
@@ -719,13 +1136,71 @@ class RPN(object):
         """
         zoom each color plane proportional to its wavelength
         zoom shrinks in proportion to wavelength
+        A (3, X, Y) stack is zoomed in one pass, each plane by its own
+        coefficient when the coefficient is a (3, 1, 1) vector like Sw.
+        The spline 'order' (default 3) is taken from the symbol table.
+        Interpolation weights are cached per coefficients and shape.
         """
-        X, Y   = self.X, self.Y
         coeff  = self.internal_pop()
-        offset = [X*(1.0-coeff)/2.0, Y*(1.0-coeff)/2.0]
-        kernel = [[coeff, 0.0], [0.0, coeff]]
-        self.internal_push(affine_transform(
-            self.internal_pop(), kernel, offset=offset, prefilter=False))
+        source = self.internal_pop()
+        order  = self.symbol[-1].get('order', 3)
+        if self.device is not None:
+            self.internal_push(self.device.zoom(source, coeff, order))
+            return
+        stack  = source.reshape((-1,) + source.shape[-2:])
+        coeffs = tuple(numpy.broadcast_to(
+            numpy.asarray(coeff, float).reshape(-1), stack.shape[:1]))
+        zoom   = self.zooms((coeffs, stack.shape, order),
+                lambda: Zoom(coeffs, stack.shape, order))
+        if self.inplace:
+            output = self.internal_scratch(source.shape, source.dtype)
+            zoom(stack, output.reshape(stack.shape))
+        else:
+            output = zoom(stack).reshape(source.shape)
+            self.memstats['allocated'] += 1
+        self.internal_push(output)
+
+    #~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+    def internal_kernel(self, pupil, wavelength, shape):
+        """for a given aperture, generate a kernel (see Human.py)"""
+        kernel           = self.human.genAiry(0, 0, wavelength, pupil)
+        Gauss            = self.human.genGauss(wavelength)
+        # Kernel should sum to 1.0
+        kernel           = kernel / kernel.sum()
+        convolver        = Convolver(kernel, self.symbol[-1].get(
+            'budget', self.human.ignore))
+        convolver.prepare(shape)
+        if self.verbose:
+            rank, error, _, _ = convolver.factor()
+            print 'pupil=%.1e separable rank=%d error=%.1e budget=%.1e' % (
+                    pupil, rank, error, convolver.budget)
+        return (kernel, convolver, Gauss)
+
+    #~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+    def internal_border(self, policy, width):
+        """the Border for this policy and edge width, made only once"""
+        key = (policy, width)
+        if key not in self.borders:
+            self.borders[key] = Border(policy, width)
+        return self.borders[key]
+
+    #~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+    def internal_margin(self):
+        """pixels beyond each edge the current kernel reaches (--ready)"""
+        return (self.kernelX // 2, self.kernelY // 2)
+
+    #eeeeeeeeeeeeeeeeeeeeeeeeeeeeeeeeeeeeeeeeeeeeeeeeeeeeeeeeeeeeeeeeeeeeeeeeee
+    def kernelstats(self):
+        """show kernel cache hits, misses, evictions, and bytes held"""
+        self.kernels.measure()
+        print '%s bytes=%d limit=%d entries=%d' % (
+                str(self.kernels.stats), self.kernels.size,
+                self.kernels.limit, len(self.kernels.entries))
+        for (pupil, wavelength, shape), ((_, convolver, _), _) in (
+                self.kernels.entries.items()):
+            for budget, (rank, error, _, _) in convolver.factors.items():
+                print 'pupil=%.1e separable rank=%d error=%.1e budget=%.1e' % (
+                        pupil, rank, error, budget)
 
     #eeeeeeeeeeeeeeeeeeeeeeeeeeeeeeeeeeeeeeeeeeeeeeeeeeeeeeeeeeeeeeeeeeeeeeeeee
     def diffract(self):
@@ -740,37 +1215,47 @@ class RPN(object):
         # get the color plane
         source = self.internal_pop()
 
-        # don't generate a new kernel unless aperture changes
-        # This is terrible.
-        # Pupil should not be variable from function to function.
-        # It should be universal and the following code
-        # should be executed from the universal acquisition code.
-        if pupil != self.aperture:
-            """for a given aperture, generate a kernel (see Human.py)"""
-            self.aperture    = pupil
-            self.kernel      = self.human.genAiry(
-                    0, 0, self.symbol[-1]['Rw'], pupil)
-            self.Gauss       = self.human.genGauss(
-                    self.symbol[-1]['Rw'])
-            # Kernel should sum to 1.0
-            self.kernel      = self.kernel / self.kernel.sum()
-            self.kernelX, self.kernelY = self.kernel.shape
-            radius           = self.kernelX/2
-            self.kradius     = self.kradius if self.kradius>radius else radius
-            self.kradius    /= 2
-            self.mask = scipy.ones(source.shape)
-            self.mask[0:self.kradius, :] = 0.0
-            self.mask[:, 0:self.kradius] = 0.0
-            self.mask[-self.kradius:-1,:] = 0.0
-            self.mask[:,-self.kradius:-1] = 0.0
+        # don't generate a new kernel unless this pupil, wavelength,
+        # and frame shape have not been seen recently (see Cache).
+        symbol     = self.symbol[-1]
+        wavelength = symbol.get('wavelength', symbol['Rw'])
+        self.kernels.limit = symbol.get('kernelbytes', self.kernels.limit)
+        # A (3, X, Y) stack shares the kernel of its (X, Y) planes.
+        shape      = source.shape[-2:]
+        (self.kernel, self.convolver, self.Gauss) = self.kernels(
+                (pupil, wavelength, shape),
+                lambda: self.internal_kernel(pupil, wavelength, shape))
+        self.aperture = pupil
+        self.kernelX, self.kernelY = self.kernel.shape
         # 'full' didn't eliminate the edge reflection defect.
         mode = self.symbol[-1].get('boundary', 'same')
+        # 'auto', 'direct', 'fft' (FFT reuses the kernel spectrum),
+        # or 'separable' (fewest 1-D passes within the 'budget' error).
+        method = self.symbol[-1].get('convolver', 'auto')
+        # Prevent the convolution defect from appearing by a 'border'
+        # policy (see Border.py): zero or crop the defect region
+        # ('margin' wide), or reflect or wrap the plane to avoid it.
+        # Under --ready the capture is oversized and __call__ crops.
+        policy = self.symbol[-1].get('border', 'none' if self.ready else 'zero')
+        radius = self.kernelX // 2
+        if policy in ('reflect', 'wrap'):
+            border = self.internal_border(policy, radius)
+            source = border.pad(source)
+            mode   = 'valid'
+        else:
+            border = self.internal_border(
+                    policy, self.symbol[-1].get('margin', radius // 2))
         attenuate = 0.95
-        temp      = attenuate * convolve(source, self.kernel, mode=mode)
-        # Prevent the convolution defect from appearing
-        # by limiting the image to within the non-defect region.
-        temp     *= self.mask
-        self.internal_push(temp)
+        # Without OpenCL, Device.convolve is only a direct convolution;
+        # the Convolver's choice of method is faster on the CPU.
+        device = self.device is not None and self.device.available
+        if device and mode == 'same':
+            temp  = self.device.convolve(source, self.kernel, attenuate)
+        else:
+            temp  = self.convolver(source, mode=mode, method=method)
+            temp *= attenuate
+            self.memstats['allocated'] += 1
+        self.internal_push(border(temp))
 
     #eeeeeeeeeeeeeeeeeeeeeeeeeeeeeeeeeeeeeeeeeeeeeeeeeeeeeeeeeeeeeeeeeeeeeeeeee
     def average(self):
@@ -788,8 +1273,23 @@ class RPN(object):
     def normalize(self):
         """Force the value at the top of stack to maximize at 1.0"""
         source = self.internal_pop()
-        M = source.max()
-        M = 1.0 if M == 0.0 else M
+        if self.device is not None:
+            self.internal_push(self.device.normalize(source))
+            return
+        alone  = sys.getrefcount(source) == 2 + self.pool.references(source)
+        if source.ndim == 3:
+            # each plane of a (3, X, Y) stack is normalized on its own
+            M = source.max(axis=(1, 2), keepdims=True)
+            M[M == 0.0] = 1.0
+        else:
+            M = source.max()
+            M = 1.0 if M == 0.0 else M
+        if self.inplace:
+            out = self.internal_out((source, M), (alone, False))
+            if out is not None:
+                self.internal_push(numpy.divide(source, M, out=out))
+                return
+        self.memstats['allocated'] += 1
         self.internal_push(source/M)
 
     #~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
@@ -825,12 +1325,26 @@ class RPN(object):
         return (self.get_linux_terminal() if os.name == 'posix' else
                 self.get_windows_terminal())
 
+#~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+def scipyMethod(name, function, arity):
+    """build an RPN method applying one registry entry"""
+    def method(self):
+        self.internal_apply(function, arity)
+    method.__name__ = name
+    method.__doc__  = 'from scipy suite (%d args)' % (arity)
+    return method
+
 #~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
 # Note that this is a top-level function executed when the module is loaded.
 def addscipy():
-    """add scipy functions to RPN as class methods"""
-    for a, f in ((argc,fmtc), (argp,fmtp), (arg1,fmt1), (arg2,fmt2)):
-        for arg, fmt in product(a, f): exec(fmt % (arg, arg))
+    """add scipy functions to RPN as a dispatch table and class methods"""
+    RPN.registry = {}
+    for names, module, arity in suites:
+        for name in names:
+            value    = getattr(module, name)
+            function = value if arity else (lambda value=value: value)
+            RPN.registry[name] = (function, arity)
+            setattr(RPN, name, scipyMethod(name, function, arity))
 
 # This call adds all the scipy methods to the RPN class before instancing.
 addscipy()
@@ -855,10 +1369,25 @@ RPN.functions = {
     'interpret_dictionary': RPN.interpret_dictionary,
     'interpret_rawPython' : RPN.interpret_rawPython,}
 
+# Branches which match whole words rather than a key character.
+RPN.words = ['interpret_function', 'interpret_dictionary', 'interpret_rawPython']
+
+# Branches with dedicated opcode generators (see internal_translate).
+RPN.compilers = {
+    'interpret_multipart' : RPN.compile_multipart,
+    'interpret_comment'   : RPN.compile_comment,
+    'interpret_number'    : RPN.compile_number,
+    'interpret_symbol'    : RPN.compile_symbol,
+    'interpret_array'     : RPN.compile_array,
+    'interpret_squote'    : RPN.compile_squote,
+    'interpret_arithmetic': RPN.compile_arithmetic,
+    'interpret_call'      : RPN.compile_call,
+    'interpret_quit'      : RPN.compile_quit,}
+
 #MMMMMMMMMMMMMMMMMMMMMMMMMMMMMMMMMMMMMMMMMMMMMMMMMMMMMMMMMMMMMMMMMMMMMMMMMMMMMM
 if __name__ == '__main__':
 
-    from Capture import Main
+    from Capture import Main, source, sink
 
     #~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
     def scipyFunctions(rpn, count, names):
@@ -877,6 +1406,52 @@ if __name__ == '__main__':
                 eval('rpn.%s()' % (n)); rpn.show(); rpn.clear()
 
     # there are 3 good Main entrypoints and one for a bad command line
+    #~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+    def test_threads(program, threads=3, runs=4, frames=30):
+        """pipelined offline output must match serial for a stateful fun"""
+        import tempfile
+        handle, path = tempfile.mkstemp(suffix='.rpn')
+        os.write(handle, '\n'.join(program) + '\n')
+        os.close(handle)
+        def filtered(count):
+            fun, output = RPN(rpn=path), []
+            main = Main(size=(41, 41), threads=count, rpn=path)
+            sink = type('Collect', (object,), {
+                '__call__': lambda self, rgb: output.append(rgb.tostring()),
+                'close'   : lambda self: None})()
+            main.run(source('synthetic', main.size, frames), sink, fun=fun)
+            return output
+        try:
+            serial = filtered(0)
+            for run in range(runs):
+                output = filtered(threads)
+                differ = [n for n, (a, b) in enumerate(zip(serial, output))
+                        if a != b]
+                assert len(output) == frames and not differ, differ
+        finally:
+            os.remove(path)
+        print "\t%d runs with %d threads match serial: %s" % (
+                runs, threads, ' '.join(program))
+
+    #~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+    def test_thread_failure(frames=30, fail=5):
+        """a filter exception must reach Main.run, not hang the pipeline"""
+        def fun(source, **kw):
+            fun.calls += 1
+            if fun.calls == fail:
+                raise ValueError('frame %d' % (fail))
+            return source
+        for threads in (1, 3):
+            fun.calls = 0
+            main = Main(size=(21, 21), threads=threads)
+            try:
+                main.run(source('synthetic', main.size, frames), sink('null'),
+                        fun=fun)
+            except ValueError:
+                continue
+            raise AssertionError('%d threads: no exception' % (threads))
+        print "\tfilter exceptions reach Main.run"
+
     #~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
     def unittest(**kw):
         """Main entrypoint for unittests"""
@@ -886,6 +1461,15 @@ if __name__ == '__main__':
         scipyFunctions(rpn, 2, arg2)
         print "\tconstants"
         scipyConstants()
+        print "\tpipeline threads"
+        # Arrays made fresh each frame, then symbols kept between frames.
+        test_threads([
+                'Rs', '2', '*', 'sqrt', 'normalize', '@Rt',
+                'Gs', 'Gs', '*', '1', '+', '@Gt',
+                'Bs', 'Rs', '-', 'square', '0.9', 'zoom', '@Bt'])
+        test_threads(['Ss', '@St'])
+        test_threads(['Rs', '@Rt', 'Gs', '@Gt', 'Bs', '2', '*', '@Bt'])
+        test_thread_failure()
         print "\tcommands"
         cmds = [".verbose", "# A comment.", "4", "sqrt", "show"]
         rpn.internal_interpret(cmds[1:]) # without .verbose
@@ -893,6 +1477,80 @@ if __name__ == '__main__':
         rpn.internal_interpret('.')
         print "\tend of tests"
 
+    #~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+    def benchmark(**kw):
+        """Main entrypoint for timing token dispatch (tokens per second)"""
+        body   = ['3', '+', '2', '-', '4', '*', '2', '/', '1', '^', 'sqrt']
+        script = ['2',] + body * kw.get('repeat', 10000)
+
+        # The methods addscipy exec'd from format strings before it used
+        # the registry, so the eval baseline runs the original code path.
+        fmt1 = ('def %s(self): ' +
+                'self.internal_push(scipy.%s(self.internal_pop()))')
+        fmt2 = ('def %s(self): a=self.internal_pop();' +
+                'self.internal_push(scipy.%s(self.internal_pop(),a))')
+        namespace = {'scipy': scipy}
+        for name in ('sqrt',):
+            exec(fmt1 % (name, name)) in namespace
+        for name in arith.values():
+            exec(fmt2 % (name, name)) in namespace
+        Exec = type('Exec', (RPN,), dict((name, namespace[name])
+            for name in arith.values() + ['sqrt']))
+
+        def evaluated():
+            """dispatch as interpret_arithmetic/function did, with eval"""
+            rpn.__class__ = Exec
+            try:
+                for token in script:
+                    if token[0] in '0123456789':
+                        rpn.internal_push(float(token))
+                    else:
+                        eval('rpn.%s()' % (arith.get(token, token)))
+            finally:
+                rpn.__class__ = RPN
+
+        def sequenced():
+            """dispatch through the RPN.sequence branch walk"""
+            for token in script:
+                rpn.internal_execute(token[:1], token[1:])
+
+        def compiled():
+            """dispatch compiled opcodes through the scipy registry"""
+            rpn.internal_interpret(script)
+
+        print "\t%d tokens" % (len(script))
+        for name, path in (
+                ('eval', evaluated), ('sequence', sequenced),
+                ('compile', compiled), ('cached', compiled)):
+            rpn.clear()
+            t0 = time.time()
+            path()
+            dt = time.time() - t0
+            print "%-10s %12.0f tokens/s %s" % (name, len(script)/dt, rpn.stack)
+
+        # Full size array allocations per frame with and without reuse.
+        program = [
+                'Rs', '2', '*', 'sqrt', 'normalize', '@Rt',
+                'Gs', 'Gs', '*', '1', '+', '@Gt',
+                'Bs', 'Rs', '-', 'square', '0.9', 'zoom', '@Bt']
+        frames  = kw.get('frames') or 100
+        edge    = 1 + 2 * kw.get('radius', 50)
+        source  = scipy.random.random((3, edge, edge)).astype('float32')
+        print "\t%d frames of %s" % (frames, str(source.shape))
+        for inplace in (False, True):
+            rpn.clear()
+            rpn.inplace = inplace
+            rpn.X, rpn.Y = edge, edge
+            rpn.memstats = dict.fromkeys(rpn.memstats, 0)
+            t0 = time.time()
+            for frame in range(frames):
+                rpn.symbol[-1].update(zip(('Rs', 'Gs', 'Bs'), source))
+                rpn.internal_interpret(program)
+            dt = time.time() - t0
+            print "inplace=%-5s %6.1f frames/s %s" % (inplace, frames/dt,
+                    ' '.join(['%s=%.1f/frame' % (key, float(val)/frames)
+                        for key, val in sorted(rpn.memstats.items())]))
+
     #~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
     def calculator(**kw):
         """Main entrypoint for command-line calculator"""
@@ -919,10 +1577,23 @@ if __name__ == '__main__':
         main = Main(size=(x,y), **kw)
         main(**kw)
 
+    #~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+    def offline(**kw):
+        """Main entrypoint for filtering headless frames (no wx or display)"""
+        edge = 1 + 2 * kw.get('radius', 50)
+        main = Main(size=(edge,edge), **kw)
+        count, seconds = main.run(
+                source(kw['input'], main.size, kw['frames']),
+                sink(kw['output']), **kw)
+        print '%d frames in %.3f seconds (%.1f frames/second)' % (
+                count, seconds, count / seconds)
+
     #mmmmmmmmmmmmmmmmmmmmmmmmmmmmmmmmmmmmmmmmmmmmmmmmmmmmmmmmmmmmmmmmmmmmmmmmmm
     mode = {'calculator':calculator,
             'unittest'  :unittest,
-            'capture'   :capture   } #, 'illegal' :illegal }
+            'benchmark' :benchmark,
+            'capture'   :capture,
+            'offline'   :offline   } #, 'illegal' :illegal }
 
     #~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
     def illegal(**kw):
@@ -949,6 +1620,24 @@ if __name__ == '__main__':
             '-e', '--ready', action="store_true", default=False, help="ready")
     parser.add_option(
             '-g', '--gpgpu', action="store_true", default=False, help="use gpgpu")
+    parser.add_option(
+            '-i', '--input', type=str, default='synthetic',
+            help='offline frames from synthetic, dir:path, or raw:path')
+    parser.add_option(
+            '-o', '--output', type=str, default='null',
+            help='offline frames to null, dir:path, or raw:path')
+    parser.add_option(
+            '-n', '--frames', type=int, default=None,
+            help='number of offline frames')
+    parser.add_option(
+            '-p', '--inplace', action="store_true", default=False,
+            help='reuse stack and pooled arrays as ufunc outputs (see Pool)')
+    parser.add_option(
+            '-f', '--fps', type=float, default=30.0,
+            help='target frames per second for the screen viewer')
+    parser.add_option(
+            '-t', '--threads', type=int, default=1,
+            help='filter threads between grab and paint (0: no pipeline)')
     parser.add_option(
             '-v', '--verbose', action="store_true", default=False, help="test")
     (opts, args) = parser.parse_args()
@@ -32,7 +32,7 @@ You should have received a copy of the GNU General Public License
 along with this program.  If not, see <http://www.gnu.org/licenses/>.
 """
 
-import os, sys
+import os, sys, numpy
 
 sys.path.append('..')
 
@@ -42,8 +42,23 @@ from Tag import *
 render = rules['render']
 
 class Report(Logger):
-    def __init__(self, markup):
-        prefix = {'.': 'passed', '?': 'warning', '!': 'error', '^': 'header'}
+    """
+    Report renders a table from markup lines ('a|.b|!c') or, in bulk,
+    from a 2-D array or a dict of columns with a style per cell.
+    A cell style is a prefix: '.' passed, '?' warning, '!' error,
+    '^' header; anything else is info.
+    """
+
+    prefix = {'.': 'passed', '?': 'warning', '!': 'error', '^': 'header'}
+
+    def __init__(self, markup, sink=None, styles=None, fmt='%s'):
+        prefix = Report.prefix
+        self.document = Document.current()  # this thread's report
+        if sink is not None:
+            TAG.stream(sink)    # rows go to sink as they are generated
+        if isinstance(markup, (dict, numpy.ndarray)):
+            self.bulk(markup, styles, fmt)
+            return
         with TABLE():
             for line in markup:
                 with TR():
@@ -55,9 +70,51 @@ class Report(Logger):
                         attributes = {'value': cell}
                         attributes.update(render['cell.%s' % (style)])
                         TD('close', **attributes)
+
+    def bulk(self, data, styles=None, fmt='%s'):
+        """
+        bulk renders a 2-D array, or a dict of columns under a header row.
+        styles (prefix characters) broadcasts against the cells;
+        fmt formats each value (header names are written as they are).
+        The TD of each style is rendered once and split around its value,
+        then each row is written whole.
+        """
+        header = None
+        if isinstance(data, dict):
+            header = list(data.keys())  # use an OrderedDict to fix the order
+            data   = numpy.column_stack([data[name] for name in header])
+        data   = numpy.asarray(data)
+        assert data.ndim == 2
+        styles = numpy.broadcast_to(
+                numpy.asarray('' if styles is None else styles), data.shape)
+        if data.size:
+            fmt % (data.flat[0])    # a bad fmt fails before any output
+        templates = {}
+        for mark in set(styles.flat) | set('^'):
+            attributes = {'value': '\0'}
+            attributes.update(render['cell.%s' % (
+                Report.prefix.get(mark, 'info'))])
+            # Emitted by TD itself so attributes come out in TD's order.
+            with Document() as scratch:
+                TD('close', **attributes)
+            templates[mark] = scratch.final().strip().split('\0')
+        document = self.document
+        with TABLE():
+            tr = document.indent()
+            td = tr + ' ' * TAG.space
+            def row(values, marks, fmt):
+                document.add(''.join([tr, '<tr>\n'] + [
+                    td + templates[mark][0] + fmt % (value) +
+                    templates[mark][1] + '\n'
+                    for value, mark in zip(values, marks)] + [tr, '</tr>\n']))
+            if header is not None:
+                row(header, '^' * len(header), '%s')
+            for values, marks in zip(data, styles):
+                row(values, marks, fmt)
+
     @property
     def final(self):
-        return TAG.final()
+        return self.document.final()
 
 if __name__ == "__main__":
     ##########################################################################
@@ -190,6 +247,41 @@ if __name__ == "__main__":
             with RedirectStdStreams(stdout=devnull, stderr=devnull):
                 showDiff(two[0], two[1])
 
+    #TTTTTTTTTTTTTTTTTTTTTTTTTTTTTTTTTTTTTTTTTTTTTTTTTTTTTTTTTTTTTTTTTTTTTTTTTT
+    def test_bulk():
+        """Bulk arrays and columns must render as the same markup does."""
+        expect = Report(['^x|^y|^z', 'a|b|c', '.d|?e|!f', 'g|h|i']).final
+        cells  = numpy.array(
+                [['a', 'b', 'c'], ['d', 'e', 'f'], ['g', 'h', 'i']])
+        styles = numpy.array([['', '', ''], ['.', '?', '!'], ['', '', '']])
+        header = Report(['^x|^y|^z']).final.splitlines()
+        actual = Report(cells, styles=styles).final.splitlines()
+        assertEqual('\n'.join(header[:-1] + actual[1:]) + '\n', expect)
+        from collections import OrderedDict
+        columns = OrderedDict(zip('xyz', cells.T))
+        assertEqual(Report(columns, styles=styles).final, expect)
+        timing = OrderedDict([('grab', [0.5, 0.25]), ('paint', [1.0, 2.0])])
+        expect = Report(['^grab|^paint', '0.50|1.00', '0.25|2.00']).final
+        assertEqual(Report(timing, fmt='%.2f').final, expect)
+
+    #TTTTTTTTTTTTTTTTTTTTTTTTTTTTTTTTTTTTTTTTTTTTTTTTTTTTTTTTTTTTTTTTTTTTTTTTTT
+    def test_bulk_rate(rows=20000, cols=4):
+        """Compare cells/second for markup and bulk timing matrices."""
+        import time
+        timing = numpy.random.random((rows, cols))
+        styles = numpy.where(timing > 0.9, '!', '.')
+        markup = ['|'.join(style + str(value) for value, style in zip(*row))
+                for row in zip(timing, styles)]
+        for name, args, kw in (
+                ('markup', (markup,), {}),
+                ('bulk'  , (timing,), {'styles': styles})):
+            t0 = time.time()
+            Report(*args, **kw).final
+            print '%-6s %9.0f cells/second' % (
+                    name, rows * cols / (time.time() - t0))
+
     test_simple()
     test_constructed()
     test_100_percent()
+    test_bulk()
+    test_bulk_rate()
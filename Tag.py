@@ -73,6 +73,158 @@ from Color      import Color
 from Logger     import Logger
 from RedirectIO import RedirectStdStreams
 
+###############################################################################
+# TAG OUTPUT
+
+class Writer(object):
+    """
+    Writer collects emitted text as a list of chunks joined once by final().
+    Given a file-like sink it instead writes the chunks out whenever
+    chunksize characters have collected, so a report is never whole in memory.
+    """
+
+    #++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+    def __init__(self, sink=None, chunksize=1<<16):
+        self.sink      = sink
+        self.chunksize = chunksize
+        self.chunks    = []
+        self.size      = 0
+
+    #--------------------------------------------------------------------------
+    def write(self, msg):
+        self.chunks.append(msg)
+        self.size += len(msg)
+        if self.sink is not None and self.size >= self.chunksize:
+            self.flush()
+
+    #--------------------------------------------------------------------------
+    def flush(self):
+        """write collected chunks to the sink (if there is one)"""
+        if self.sink is not None and self.chunks:
+            self.sink.write(''.join(self.chunks))
+            self.chunks, self.size = [], 0
+
+    #--------------------------------------------------------------------------
+    def getvalue(self):
+        """text not yet written to a sink (all of it if there is none)"""
+        return ''.join(self.chunks)
+
+###############################################################################
+# TAG DOCUMENT
+
+class Document(object):
+    """
+    Document owns the output, tag stack, and error lists of one report.
+    Tags write to the current Document: the one made current by 'with',
+    otherwise a default made on first use.  Defaults are per thread
+    (per context under Python 3), so reports can be built in parallel.
+        with Document() as doc:
+            with TABLE(): ...
+        xml = doc.final()
+    """
+
+    #++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+    def __init__(self, sink=None, DTD="", chunksize=1<<16):
+        self.context   = [] # tag stack for validation against parents
+        self.problem   = [] # list of errors encountered
+        self.residual  = [] # leftover errors from last run survives final()
+        self.count     = {} # instance of tag (used for error messages)
+        self.previous  = [] # Documents current before each 'with'
+        self.out       = Writer()   # replaced, text and all, by stream()
+        self.stream(sink, DTD, chunksize)
+
+    #--------------------------------------------------------------------------
+    @staticmethod
+    def current():
+        """the Document tags write to in this thread (or context)"""
+        document = _current_get()
+        if document is None:
+            document = Document()
+            _current_set(document)
+        return document
+
+    #--------------------------------------------------------------------------
+    def __enter__(self):
+        self.previous.append(_current_get())
+        _current_set(self)
+        return self
+
+    #--------------------------------------------------------------------------
+    def __exit__(self, aType, aValue, aTraceback):
+        _current_set(self.previous.pop())
+
+    #--------------------------------------------------------------------------
+    def stream(self, sink=None, DTD="", chunksize=1<<16):
+        """
+        stream() sends the document to a file-like sink as it is generated.
+        The XML header is written first when DTD is non-empty;
+        final() then only flushes and validates.
+        Text emitted before stream() follows the header into the new sink,
+        after any of it bound for an earlier sink is flushed there.
+        """
+        pending  = self.out
+        pending.flush()
+        self.out = Writer(sink, chunksize)
+        self.out.write(Document.prologue(DTD))
+        self.out.write(pending.getvalue())
+
+    #--------------------------------------------------------------------------
+    @staticmethod
+    def prologue(DTD=""):
+        return ("""\
+<?xml version="1.0"?>
+<!DOCTYPE report SYSTEM "%s">
+""" % (DTD) if DTD != "" else "")
+
+    #--------------------------------------------------------------------------
+    def final(self, DTD="", ignore=False):
+        """
+        final() checks for errors, delivers accumulated string, and resets vars
+
+        DTD   : if a non-empty string, generate standard XML header
+        ignore: if True, bypass assert and
+        """
+        assert len(self.context) == 0 # All contexts should have been closed
+        # Prior to clearing vars, generate output
+        # and prefix XML header if a DTD is specified.
+        # A streamed document is flushed to its sink and '' is returned.
+        self.out.flush()
+        output = Document.prologue(DTD) + self.out.getvalue()
+        # Prior to clearing vars, hold onto errors
+        hold = self.residual = self.problem
+        # Clear vars
+        self.out     = Writer()
+        self.problem = []
+        self.count   = {}
+        # Handle errors
+        if 0 != len(hold) and not ignore:
+            print output
+            print hold
+            raise Exception(str(hold))
+        return output
+
+    #--------------------------------------------------------------------------
+    def add(self, msg):
+        self.out.write(msg)
+
+    #--------------------------------------------------------------------------
+    def nl(self, msg):
+        self.out.write(msg+'\n')
+
+    #--------------------------------------------------------------------------
+    def indent(self, confirm=True):
+        return ' '*(len(self.context)*TAG.space) if confirm else ''
+
+try:
+    import contextvars
+    _current = contextvars.ContextVar('Tag.Document', default=None)
+    _current_get, _current_set = _current.get, _current.set
+except ImportError:
+    import threading
+    _current = threading.local()
+    _current_get = lambda: getattr(_current, 'document', None)
+    def _current_set(document): _current.document = document
+
 ###############################################################################
 # TAG BASE CLASS
 
@@ -88,13 +240,12 @@ class TAG(object):
     0.       : <tagname a="1">\ntext\n</a> # Require a 'with' context
     1. single: <tagname a="1">text</a>     # Require a 'with' context
     2.  close: <tagname a="1"/>\n          # Don't use 'with' context (__del__)
+    Output and state live in the current Document (see Document);
+    the static methods below act on it.
     """
-    buf        = '' # Accumulator string
     space      = 2  # Size of indent
-    context    = [] # tag stack for validation against parents
-    problem    = [] # list of errors encountered
-    residual   = [] # leftover errors from last run survives final() method
-    count      = {} # instance of tag (used for error message generation)
+    rendered   = {} # attribute strings keyed by attribute items
+    limit      = 4096 # most attribute strings kept in rendered
 
     #--------------------------------------------------------------------------
     @staticmethod
@@ -105,57 +256,64 @@ class TAG(object):
         DTD   : if a non-empty string, generate standard XML header
         ignore: if True, bypass assert and
         """
-        assert len(TAG.context) == 0 # All contexts should have been closed
-        # Prior to clearing class vars, generate output
-        # and prefix XML header if a DTD is specified
-        output = ("""\
-<?xml version="1.0"?>
-<!DOCTYPE report SYSTEM "%s">
-""" % (DTD) if DTD != "" else "") + TAG.buf
-        # Prior to clearing class vars, hold onto errors
-        hold = TAG.residual = TAG.errors()
-        # Clear class vars
-        TAG.buf     = ''
-        TAG.problem = []
-        TAG.count   = {}
-        # Handle errors
-        if 0 != len(hold) and not ignore:
-            print output
-            print hold
-            raise Exception(str(hold))
-        return output
+        return Document.current().final(DTD, ignore)
+
+    #--------------------------------------------------------------------------
+    @staticmethod
+    def stream(sink, DTD="", chunksize=1<<16):
+        """stream() sends the current document to a file-like sink"""
+        Document.current().stream(sink, DTD, chunksize)
 
     #--------------------------------------------------------------------------
     @staticmethod
     def add(msg):
-        TAG.buf += msg
+        Document.current().add(msg)
 
     #--------------------------------------------------------------------------
     @staticmethod
     def nl(msg):
-        TAG.add(msg+'\n')
+        Document.current().nl(msg)
 
     #--------------------------------------------------------------------------
     @staticmethod
     def indent(confirm=True):
-        return ' '*(len(TAG.context)*TAG.space) if confirm else ''
+        return Document.current().indent(confirm)
+
+    #--------------------------------------------------------------------------
+    @staticmethod
+    def render(kw):
+        """' key="val"' attribute string, rendered once per unique kw"""
+        items = tuple(kw.iteritems())
+        # 1, True, and 1.0 are equal keys but render differently.
+        key   = tuple((name, type(val), val) for name, val in items)
+        try:
+            return TAG.rendered[key]
+        except KeyError:
+            if len(TAG.rendered) >= TAG.limit:
+                TAG.rendered.clear()
+            text = TAG.rendered[key] = ''.join(
+                    ' %s="%s"' % item for item in items)
+            return text
+        except TypeError:   # unhashable attribute values are not cached
+            return ''.join(' %s="%s"' % item for item in items)
 
     #--------------------------------------------------------------------------
     @staticmethod
     def errors():
-        return TAG.problem
+        return Document.current().problem
 
     #--------------------------------------------------------------------------
     @staticmethod
     def residue():
-        return TAG.residual
+        return Document.current().residual
 
     #~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
     def caller(self):
-        caller = inspect.stack()[2]
-        callfile = caller[1]
-        callline = caller[2]
-        callname = caller[3]
+        """where the tag was misused; only looked up to report an error"""
+        caller = sys._getframe(2)
+        callfile = caller.f_code.co_filename
+        callline = caller.f_lineno
+        callname = caller.f_code.co_name
         return "%s[%d]: %s" % (callfile, callline, callname)
 
     #++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
@@ -164,11 +322,12 @@ class TAG(object):
         __del__ is required to test for absence of context for keyword 'single'
         """
         if self.open:
-            name, count = self.tagname.upper(), TAG.count[self.tagname]
+            document    = self.document
+            name, count = self.tagname.upper(), document.count[self.tagname]
             msg = "(%s) missing 'with' or 'close': %s instance %d" % (
                     self.caller(), name, count)
-            TAG.problem  += [msg,]
-            #raise Exception(TAG.problem)
+            document.problem += [msg,]
+            #raise Exception(document.problem)
 
     #++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
     def __init__(self, tagname, *args, **kw):
@@ -177,53 +336,49 @@ class TAG(object):
         self.kw           = kw
         self.close        = False   # If True close within the same tag.
         self.single       = False   # If True keep on a single line.
-        self.attributes   = ''
+        self.attributes   = TAG.render(kw)
+        self.document     = document = Document.current()
 
-        TAG.count[tagname]= TAG.count.get(tagname, 0)+1
+        document.count[tagname] = document.count.get(tagname, 0)+1
         # Make instance variables from kw
         for arg in args:
-            exec('self.%s=True' % (arg))
+            setattr(self, arg, True)
         # Prepare for a context
         self.open         = True
         # But bypass context code id self-closing
         if self.close:
             # Generate the self-closing tag
-            TAG.add(TAG.indent()+'<'+self.tagname)
-            for key, val in self.kw.iteritems():
-                TAG.add(' %s="%s"' % (key, val))
-            TAG.nl('/>')
+            document.nl(document.indent()+'<'+tagname+self.attributes+'/>')
             # And make it illegal to go into a context.
             self.open     = False
 
     #++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
     def __enter__(self):
+        document = self.document
         if not self.open:
-            name, count = self.tagname.upper(), TAG.count[self.tagname]
+            name, count = self.tagname.upper(), document.count[self.tagname]
             msg = "(%s) forbidden 'with' and 'close': %s instance %d" % (
                     self.caller(), name, count)
-            TAG.problem  += [msg,]
+            document.problem += [msg,]
         self.open = False # Used to assert closed on close, single, and multi.
-        # Begin tag
-        TAG.add(TAG.indent()+'<'+self.tagname)
-        # Insert attributes
-        for key, val in self.kw.iteritems():
-            TAG.add(' %s="%s"' % (key, val))
-        # Close with or without NL
-        TAG.add('>') if self.single else TAG.nl('>')
+        # Begin tag with its attributes and close with or without NL
+        begin = document.indent()+'<'+self.tagname+self.attributes+'>'
+        document.add(begin) if self.single else document.nl(begin)
         # Test validity of tree when required
         upname = self.tagname.upper()
-        if upname in allow.keys():
+        if upname in allow:
             parents = allow[upname]
             if len(parents) > 0:
-                assert TAG.context[-1] in parents # tag has  wrong parent
+                assert document.context[-1] in parents # tag has wrong parent
         # Update context stack
-        TAG.context += [upname,]
+        document.context += [upname,]
         return self
 
     #++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
     def __exit__(self, aType, aValue, aTraceback):
-        TAG.context = TAG.context[:-1]
-        TAG.nl(TAG.indent(not self.single)+'</%s>' % (self.tagname))
+        document = self.document
+        document.context = document.context[:-1]
+        document.nl(document.indent(not self.single)+'</%s>' % (self.tagname))
 
 ###############################################################################
 # TAG GENERATION
@@ -240,15 +395,12 @@ def defineTag(tag, *args, **kw):
     |     def __init__(self, *args, **kw):                        |
     |         super(TABLE, self).__init__('table',*args,**kw)     |
     +-------------------------------------------------------------+
+    The class is built with type(); a rule's close/single is not applied.
     """
-    #TODO, does this next line break anything?  Check.
-    kw = ''
-    classline = "class %s(TAG):" % (tag)
-    defline   = "def __init__(self, *args, **kw):"
-    codeline  = "super(%s,self).__init__('%s',*args,**kw)" % (
-            tag,tag.lower())
-    generated = '%s\n    %s\n        %s' % (classline, defline, codeline)
-    return generated
+    tagname = tag.lower()
+    def __init__(self, *args, **kw):
+        TAG.__init__(self, tagname, *args, **kw)
+    return type(tag, (TAG,), {'__init__': __init__})
 
 #~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
 with open('rules.Tag') as source:
@@ -266,10 +418,10 @@ with open('rules.Tag') as source:
             assert cond.lower() in ['close', 'single']
             condict = {cond: True}
             allow[key] = val
-            exec(defineTag(key, **condict))
+            globals()[key] = defineTag(key, **condict)
         else:
             allow[bigkey] = val
-            exec(defineTag(bigkey))
+            globals()[bigkey] = defineTag(bigkey)
 
 ###############################################################################
 # MAIN
@@ -663,6 +815,94 @@ invisible
                 TD('close', **render['cell.error'])
         assertEqual(TAG.final(DTD="Logger.dtd"), expect)
 
+    #TTTTTTTTTTTTTTTTTTTTTTTTTTTTTTTTTTTTTTTTTTTTTTTTTTTTTTTTTTTTTTTTTTTTTTTTTT
+    def test_XML_streamed():
+        """A streamed document must match the same document from final()."""
+        from StringIO import StringIO
+        def rows():
+            with TABLE():
+                for row in range(100):
+                    with TR():
+                        TD('close', value=row)
+        rows()
+        expect = TAG.final(DTD="Logger.dtd")
+        sink   = StringIO()
+        TAG.stream(sink, DTD="Logger.dtd", chunksize=256)
+        rows()
+        final  = TAG.final()
+        assertEqual((final, sink.getvalue()), ('', expect))
+
+    #TTTTTTTTTTTTTTTTTTTTTTTTTTTTTTTTTTTTTTTTTTTTTTTTTTTTTTTTTTTTTTTTTTTTTTTTTT
+    def test_XML_streamed_late():
+        """Text emitted before stream() must reach the sink, not be lost."""
+        from StringIO import StringIO
+        def rows(first, last):
+            for row in range(first, last):
+                with TR():
+                    TD('close', value=row)
+        with TABLE():
+            rows(0, 100)
+        expect = TAG.final(DTD="Logger.dtd")
+        sink   = StringIO()
+        with TABLE():
+            rows(0, 50)
+            TAG.stream(sink, DTD="Logger.dtd", chunksize=256)
+            rows(50, 100)
+        final  = TAG.final()
+        assertEqual((final, sink.getvalue()), ('', expect))
+
+    #TTTTTTTTTTTTTTTTTTTTTTTTTTTTTTTTTTTTTTTTTTTTTTTTTTTTTTTTTTTTTTTTTTTTTTTTTT
+    def test_threaded_documents():
+        """Documents built at once in threads must not interleave."""
+        import threading
+        def build(n, results):
+            with Document() as document:
+                with TABLE(id=n):
+                    for row in range(200):
+                        with TR():
+                            TD('close', value=row)
+            results[n] = document.final()
+        results = {}
+        threads = [threading.Thread(target=build, args=(n, results))
+                for n in range(8)]
+        for thread in threads: thread.start()
+        for thread in threads: thread.join()
+        build('expect', results)
+        expect  = results.pop('expect')
+        actual  = [result.replace('id="%d"' % n, 'id="expect"')
+                for n, result in sorted(results.items())]
+        assertEqual(actual, [expect]*8)
+
+    #TTTTTTTTTTTTTTTTTTTTTTTTTTTTTTTTTTTTTTTTTTTTTTTTTTTTTTTTTTTTTTTTTTTTTTTTTT
+    def test_equal_attribute_values():
+        """Equal values of different types must not share a rendering."""
+        expect = \
+"""\
+<td a="1"/>
+<td a="True"/>
+<td a="1.0"/>
+"""
+        TD('close', a=1)
+        TD('close', a=True)
+        TD('close', a=1.0)
+        assertEqual(TAG.final(), expect)
+
+    #BBBBBBBBBBBBBBBBBBBBBBBBBBBBBBBBBBBBBBBBBBBBBBBBBBBBBBBBBBBBBBBBBBBBBBBBBB
+    def benchmark_TD(count=20000):
+        """Report the rate of TD emission with repeating render styles."""
+        import time
+        render = rules['render']
+        styles = ['cell.%s' % style
+                for style in ('info', 'passed', 'warning', 'error')]
+        t0 = time.time()
+        with TABLE():
+            for row in range(count / len(styles)):
+                with TR():
+                    for style in styles:
+                        TD('close', **render[style])
+        TAG.final()
+        logger.info('%.0f TD/s' % (count / (time.time() - t0)))
+
   #############################################################################
   # TEST
     def main():
@@ -684,6 +924,14 @@ invisible
         test_XML_with_simplified_attributes()
         test_XML_attributes()
         test_XML_prologue()
+        test_XML_streamed()
+        test_XML_streamed_late()
+        test_threaded_documents()
+        test_equal_attribute_values()
+
+        logger.info('='*79)
+
+        benchmark_TD()
 
         logger.info('='*79)
 
@@ -0,0 +1,86 @@
+// diffract.cl
+// Operations on one row-major (X, Y) float plane; one work item per pixel.
+// Each matches the CPU path in RPN.py within float32 rounding.
+
+// scipy.signal.convolve(source, weights, 'same') * factor * mask
+__kernel void convolve(
+        __global const float* source,
+        __global const float* weights,
+        __global const float* mask,
+        __global       float* target,
+        const int KX, const int KY, const float factor)
+{
+    const int X  = get_global_size(0), Y  = get_global_size(1);
+    const int x  = get_global_id(0),   y  = get_global_id(1);
+    const int RX = (KX - 1) / 2,       RY = (KY - 1) / 2;
+    float sum = 0.0f;
+    for (int u = 0; u < KX; u++) {
+        const int i = x + RX - u;
+        if (i < 0 || i >= X) continue;
+        for (int v = 0; v < KY; v++) {
+            const int j = y + RY - v;
+            if (j < 0 || j >= Y) continue;
+            sum += weights[u * KY + v] * source[i * Y + j];
+        }
+    }
+    target[x * Y + y] = sum * factor * mask[x * Y + y];
+}
+
+// source * factor
+__kernel void scale(
+        __global const float* source,
+        __global       float* target,
+        const float factor)
+{
+    const int n = get_global_id(0) * get_global_size(1) + get_global_id(1);
+    target[n] = source[n] * factor;
+}
+
+// mirror an index into [0, n) as scipy.ndimage does for spline neighbors
+int mirror(int i, const int n)
+{
+    if (n == 1) return 0;
+    while (i < 0 || i >= n) {
+        if (i < 0)  i = -i;
+        if (i >= n) i = 2 * n - 2 - i;
+    }
+    return i;
+}
+
+// cubic B-spline weights for fractional position t
+void bspline(const float t, float* w)
+{
+    const float s = 1.0f - t;
+    w[0] = s * s * s / 6.0f;
+    w[1] = (3.0f * t * t * t - 6.0f * t * t + 4.0f) / 6.0f;
+    w[2] = (-3.0f * t * t * t + 3.0f * t * t + 3.0f * t + 1.0f) / 6.0f;
+    w[3] = t * t * t / 6.0f;
+}
+
+// scipy.ndimage.affine_transform(source, [[c,0],[0,c]], offset=(ox, oy),
+//                                order=3, prefilter=False, mode='constant')
+__kernel void zoom(
+        __global const float* source,
+        __global       float* target,
+        const float c, const float ox, const float oy)
+{
+    const int X  = get_global_size(0), Y  = get_global_size(1);
+    const int x  = get_global_id(0),   y  = get_global_id(1);
+    const float cx = c * x + ox, cy = c * y + oy;
+    if (cx < 0.0f || cx > X - 1 || cy < 0.0f || cy > Y - 1) {
+        target[x * Y + y] = 0.0f;
+        return;
+    }
+    const int fx = (int)floor(cx), fy = (int)floor(cy);
+    float wx[4], wy[4];
+    bspline(cx - fx, wx);
+    bspline(cy - fy, wy);
+    float sum = 0.0f;
+    for (int u = 0; u < 4; u++) {
+        const int i = mirror(fx - 1 + u, X);
+        for (int v = 0; v < 4; v++) {
+            sum += wx[u] * wy[v] * source[i * Y + mirror(fy - 1 + v, Y)];
+        }
+    }
+    target[x * Y + y] = sum;
+}